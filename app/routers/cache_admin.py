@@ -4,6 +4,7 @@ import redis
 import logging
 from config import settings
 from app.services.kommo_api import get_kommo_api
+from app.utils.dashboard_cache import clear_dashboard_cache
 
 # Usar instância singleton (mesma instância usada por dashboard.py)
 kommo_api = get_kommo_api()
@@ -70,6 +71,7 @@ async def flush_cache() -> Dict[str, Any]:
     try:
         # Limpar cache de memória via kommo_api singleton
         kommo_api.clear_cache()
+        clear_dashboard_cache()
 
         redis_client = get_redis_client()
         if not redis_client:
@@ -99,6 +101,7 @@ async def flush_kommo_cache() -> Dict[str, Any]:
     try:
         # Limpar cache Redis via kommo_api (que também limpa memória)
         kommo_api.clear_cache()
+        clear_dashboard_cache()
 
         redis_client = get_redis_client()
         if redis_client:
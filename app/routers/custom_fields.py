@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Query, Path
 from typing import Dict, List, Optional
+from collections import Counter
 from app.services.kommo_api import get_kommo_api
 
 router = APIRouter(prefix="/custom-fields", tags=["Custom Fields"])
@@ -139,7 +140,7 @@ async def get_custom_field_values(
         leads_data = api.get_leads({"limit": limit})
         leads = leads_data.get("_embedded", {}).get("leads", [])
         
-        values = {}
+        values = Counter()
         
         for lead in leads:
             custom_fields = lead.get("custom_fields_values", [])
@@ -164,7 +165,7 @@ async def get_custom_field_values(
                                         value = enum.get("value", "")
                                         break
                         
-                        values[value] = values.get(value, 0) + 1
+                        values[value] += 1
                     break
         
         return {
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response
 from typing import Optional
 import asyncio
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
+from collections import Counter, OrderedDict
+from functools import lru_cache, wraps
+from itertools import chain
+from operator import itemgetter
+from types import MappingProxyType
 from app.services.kommo_api import get_kommo_api
-from app.utils.date_helpers import validate_sale_in_period, get_lead_closure_date, extract_custom_field_value, format_proposal_date, format_timestamp_brazil, BRAZIL_TIMEZONE
+from app.utils.dashboard_cache import (
+    REFERENCE_CACHE, REFERENCE_LOCKS, LEADS_WINDOW_CACHE, LEADS_WINDOW_LOCKS, RESPONSE_CACHES
+)
+from app.utils.date_helpers import (
+    extract_custom_fields, parse_closure_date, format_timestamp_brazil, resolve_time_window,
+    BRAZIL_TIMEZONE, SECONDS_PER_DAY
+)
 import config
 
 router = APIRouter()
@@ -13,24 +27,396 @@ logger = logging.getLogger(__name__)
 # Usar instância singleton
 kommo_api = get_kommo_api()
 
+# Opções do custom field "Fonte" (ID: 837886) expostas aos filtros do frontend
+AVAILABLE_FONTES = (
+    "Tráfego Meta", "Escritório Patacho", "Canal Pro", "Site",
+    "Redes Sociais", "Parceria com Construtoras", "Ação de Panfletagem",
+    "Eletromídia", "Orgânico", "LandingPage", "Chamada", "Anúncio Físico",
+    "Não atribuído", "Google", "Cliente", "Grupo Zap", "Celular do Plantão",
+    "Tráfego Séculos"
+)
+
+# Métricas do Facebook removidas do dashboard de marketing - estrutura zerada compartilhada
+# (somente leitura; a resposta é serializada, nunca alterada)
+_EMPTY_FACEBOOK_METRICS = {
+    "impressions": 0,
+    "reach": 0,
+    "clicks": 0,
+    "ctr": 0,
+    "cpc": 0,
+    "totalSpent": 0,
+    "costPerLead": 0,
+    "engagement": {
+        "likes": 0,
+        "comments": 0,
+        "shares": 0,
+        "videoViews": 0,
+        "profileVisits": 0
+    }
+}
+
 # Função auxiliar global para buscar dados com fallback
 def safe_get_data(func, *args, **kwargs):
     try:
         result = func(*args, **kwargs)
-        logger.info(f"Safe get data resultado: {type(result)}, função: {func.__name__ if hasattr(func, '__name__') else 'unknown'}")
+        logger.debug("Safe get data resultado: %s, função: %s", type(result), getattr(func, '__name__', 'unknown'))
         if result is None:
-            logger.warning(f"Função {func.__name__ if hasattr(func, '__name__') else 'unknown'} retornou None")
+            logger.warning("Função %s retornou None", func.__name__ if hasattr(func, '__name__') else 'unknown')
             return {}
         if not isinstance(result, dict):
-            logger.warning(f"Função {func.__name__ if hasattr(func, '__name__') else 'unknown'} retornou tipo inválido: {type(result)}")
+            logger.warning("Função %s retornou tipo inválido: %s", func.__name__ if hasattr(func, '__name__') else 'unknown', type(result))
             return {}
         return result
     except Exception as e:
-        logger.error(f"Erro ao buscar dados de {func.__name__ if hasattr(func, '__name__') else 'unknown'}: {e}")
+        logger.error("Erro ao buscar dados de %s: %s", func.__name__ if hasattr(func, '__name__') else 'unknown', e)
         return {}
 
-@router.get("/marketing-complete")
+# Resultado compartilhado (somente leitura) para leads sem custom fields
+_NO_CUSTOM_FIELDS = MappingProxyType({})
+
+# Converte filtro de query (suporta múltiplos valores separados por vírgula) em frozenset
+def _parse_filter_values(value) -> Optional[frozenset]:
+    """Retorna frozenset com os valores do filtro ou None se o filtro não foi informado"""
+    if not value or not isinstance(value, str) or not value.strip():
+        return None
+    return frozenset(v.strip() for v in value.split(','))
+
+# Cache em processo para dados de referência do Kommo (sources, tags, users, pipelines) que mudam raramente.
+# Evita repetir chamadas à API (e ao Redis) a cada requisição do dashboard.
+async def _cached_reference(key: str, ttl: int, func):
+    """Retorna o dado de referência do cache ou busca via func (síncrona) em uma thread"""
+    entry = REFERENCE_CACHE.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    lock = REFERENCE_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        # Outra requisição pode ter preenchido o cache enquanto aguardávamos o lock
+        entry = REFERENCE_CACHE.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        value = await asyncio.to_thread(safe_get_data, func)
+        # Não cachear respostas vazias ou com erro
+        if value and not value.get("_error"):
+            REFERENCE_CACHE[key] = (time.monotonic() + ttl, value)
+        elif entry is not None:
+            # Falha transitória: servir o último valor bom (expirado) em vez de um mapa vazio
+            logger.warning("Falha ao atualizar %s; usando valor em cache expirado", key)
+            return entry[1]
+        return value
+
+async def _cached_leads_window(params_list: list, ttl: int = 60, max_pages: int = 30) -> list:
+    """
+    Leads por pipeline/período (uma lista por item de params_list), compartilhados entre requisições.
+    Filtros de corretor/fonte/produto são aplicados em Python depois da busca, então não fragmentam
+    o cache; marketing e vendas usam os mesmos parâmetros e reaproveitam a mesma entrada.
+    max_pages segue o limite de segurança de get_all_leads_old (30 páginas = 7500 leads por pipeline).
+    Levanta exceção se alguma página falhar (o chamador usa o fallback síncrono).
+    As listas retornadas são compartilhadas e não devem ser alteradas.
+    """
+    key = (max_pages,) + tuple(tuple(sorted(params.items())) for params in params_list)
+    entry = LEADS_WINDOW_CACHE.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+
+    lock = LEADS_WINDOW_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        entry = LEADS_WINDOW_CACHE.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # Só chega aqui se todos os pipelines foram buscados por completo (falha levanta exceção),
+        # então o resultado é cacheado mesmo quando algum pipeline não tem leads no período
+        results = await kommo_api.get_all_leads_parallel_async(params_list, max_pages=max_pages, raise_on_failure=True)
+        now = time.monotonic()
+        # Janelas antigas não se repetem: descartar entradas já expiradas (e seus locks livres)
+        for old_key in [k for k, v in LEADS_WINDOW_CACHE.items() if v[0] <= now]:
+            del LEADS_WINDOW_CACHE[old_key]
+            old_lock = LEADS_WINDOW_LOCKS.get(old_key)
+            if old_lock is not None and not old_lock.locked():
+                del LEADS_WINDOW_LOCKS[old_key]
+        LEADS_WINDOW_CACHE[key] = (now + ttl, results)
+        return results
+
+async def _fetch_leads_by_id(lead_ids, concurrency: int = 10) -> dict:
+    """Busca leads individuais (GET /leads/{id}) em threads, no máximo `concurrency` ao mesmo tempo; retorna {id: lead}"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(lead_id):
+        async with semaphore:
+            return await asyncio.to_thread(kommo_api.get_lead, lead_id)
+
+    lead_ids = list(lead_ids)
+    results = await asyncio.gather(*(fetch(lead_id) for lead_id in lead_ids), return_exceptions=True)
+
+    found = {}
+    for lead_id, lead in zip(lead_ids, results):
+        if isinstance(lead, Exception):
+            logger.warning("Erro ao buscar lead %s: %s", lead_id, lead)
+        elif lead and lead.get("id"):
+            found[lead_id] = lead
+    return found
+
+# Cache de respostas completas dos endpoints (curto): recarregar a página ou remontar
+# gráficos com os mesmos filtros não refaz todas as chamadas ao Kommo
+def _ttl_response_cache(ttl: int = 60, maxsize: int = 128):
+    """
+    Decorator que cacheia a resposta do endpoint por ttl segundos, chaveada pelos parâmetros da query.
+    O endpoint declara `request: Request` (usado só no ETag, fora da chave). Respostas serializadas
+    recebem ETag (hash do corpo, calculado uma vez ao guardar); If-None-Match igual retorna 304.
+
+    Atraso máximo somado das camadas, em períodos relativos (days): fim da janela arredondado para
+    baixo em blocos de 5 min + até 60s de cache de leads (_cached_leads_window) + ttl desta resposta.
+    Com os valores padrão, um lead novo pode levar até ~7 min para aparecer no dashboard. O
+    Cache-Control do navegador usa só o tempo que ainda resta da entrada, sem somar outro ttl.
+    """
+    def decorator(func):
+        cache = OrderedDict()  # key -> (expira_em, resposta, etag, media_type), ordem LRU
+        locks = {}  # key -> asyncio.Lock, só enquanto houver requisição usando ou aguardando
+        lock_users = Counter()  # key -> requisições usando/aguardando o lock
+
+        def from_cache(entry, request: Request):
+            expires_at, value, etag, media_type = entry
+            if etag is None:
+                return value
+            max_age = max(0, int(expires_at - time.monotonic()))
+            headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers=headers)
+            # Respostas já serializadas são guardadas como bytes; devolve um Response novo a cada hit,
+            # com o mesmo media type da resposta original (ORJSONResponse)
+            return Response(content=value, media_type=media_type, headers=headers)
+
+        @wraps(func)
+        async def wrapper(**kwargs):
+            request = kwargs["request"]
+            key = tuple(sorted((name, value) for name, value in kwargs.items() if name != "request"))
+            entry = cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                cache.move_to_end(key)
+                return from_cache(entry, request)
+
+            # Requisições idênticas simultâneas aguardam a primeira (single-flight)
+            lock = locks.setdefault(key, asyncio.Lock())
+            lock_users[key] += 1
+            try:
+                async with lock:
+                    entry = cache.get(key)
+                    if entry is not None and entry[0] > time.monotonic():
+                        return from_cache(entry, request)
+
+                    response = await func(**kwargs)
+                    if isinstance(response, Response):
+                        if response.status_code != 200:
+                            return response
+                        etag = f'"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"'
+                        entry = (time.monotonic() + ttl, response.body, etag, response.media_type)
+                    else:
+                        entry = (time.monotonic() + ttl, response, None, None)
+                    cache[key] = entry
+                    cache.move_to_end(key)
+                    while len(cache) > maxsize:
+                        cache.popitem(last=False)
+            finally:
+                # Remover o lock (também em caso de exceção) só quando ninguém mais o usa ou aguarda;
+                # sem await entre a contagem e o pop, nenhuma requisição pega um lock já descartado
+                lock_users[key] -= 1
+                if not lock_users[key]:
+                    del lock_users[key]
+                    del locks[key]
+            return from_cache(entry, request)
+
+        RESPONSE_CACHES.append(cache)
+        return wrapper
+    return decorator
+
+# Fim dos períodos relativos arredondado para baixo em blocos de 5 minutos para que requisições
+# próximas gerem a mesma janela e compartilhem o cache de leads (leads criados nos últimos
+# minutos entram na janela seguinte)
+_RELATIVE_WINDOW_BUCKET = 5 * 60
+
+def build_time_window(days: int, start_date: Optional[str], end_date: Optional[str]) -> tuple:
+    """Retorna (start_time, end_time) em timestamps: datas específicas se informadas, senão últimos `days` dias"""
+    try:
+        return resolve_time_window(days, start_date, end_date, bucket=_RELATIVE_WINDOW_BUCKET)
+    except ValueError as date_error:
+        logger.error("Erro de validação de data: %s", date_error)
+        raise HTTPException(status_code=400, detail="Formato de data inválido. Use YYYY-MM-DD")
+
+# Datas formatadas para as tabelas detalhadas: os mesmos timestamps se repetem entre reuniões e vendas
+@lru_cache(maxsize=4096)
+def _format_ts_brazil(timestamp: int) -> str:
+    """format_timestamp_brazil (DD/MM/YYYY HH:MM) memoizado por timestamp"""
+    return format_timestamp_brazil(timestamp)
+
+# Data de criação (YYYY-MM-DD no horário de Brasília) memoizada por dia: muitos leads caem no mesmo dia
+_BRAZIL_UTC_OFFSET = int(BRAZIL_TIMEZONE.utcoffset(None).total_seconds())
+_EPOCH_DATE = date(1970, 1, 1)
+
+@lru_cache(maxsize=4096)
+def _iso_day(day: int) -> str:
+    """YYYY-MM-DD do dia informado (dias desde 1970-01-01)"""
+    return (_EPOCH_DATE + timedelta(days=day)).isoformat()
+
+def _format_date_brazil(timestamp: int) -> str:
+    """Equivalente a format_timestamp_brazil(timestamp, "%Y-%m-%d"), sem strftime por lead"""
+    return _iso_day((int(timestamp) + _BRAZIL_UTC_OFFSET) // 86400)
+
+def _br_datetime_sort_key(value: str) -> str:
+    """Chave de ordenação para "DD/MM/YYYY HH:MM" sem strptime (reordena para YYYYMMDDHH:MM); "N/A" fica por último"""
+    if value == "N/A":
+        return ""
+    return value[6:10] + value[3:5] + value[:2] + value[11:]
+
+# Troca separadores do formato en-US (1,234.56) para pt-BR (1.234,56) em uma única passada
+_BRL_SEPARATORS = str.maketrans({',': '.', '.': ','})
+
+def _format_brl(price) -> str:
+    """Formata valor monetário como R$ 1.234,56"""
+    return "R$ " + f"{price:,.2f}".translate(_BRL_SEPARATORS)
+
+# Timestamp ISO para _metadata.generated_at, formatado no máximo uma vez por segundo
+@lru_cache(maxsize=1)
+def _iso_now(second: int) -> str:
+    """Retorna datetime.now().isoformat(); o argumento (segundo atual) serve apenas como chave do cache"""
+    return datetime.now().isoformat()
+
+# stage_map derivado do último pipelines_data; enquanto o cache de referência devolve o mesmo
+# objeto, o mapa não é reconstruído
+_STAGE_MAP_CACHE = {"source": None, "stage_map": {}}
+
+def _build_stage_map(pipelines_data) -> dict:
+    """Mapeia status_id -> nome do estágio a partir da resposta de pipelines do Kommo"""
+    if pipelines_data is _STAGE_MAP_CACHE["source"]:
+        return _STAGE_MAP_CACHE["stage_map"]
+
+    stage_map = {}
+    if pipelines_data and isinstance(pipelines_data, dict):
+        pipelines = (pipelines_data.get("_embedded") or {}).get("pipelines")
+        if pipelines and isinstance(pipelines, list):
+            stage_map = {
+                status["id"]: status["name"]
+                for pipeline in pipelines
+                if pipeline and isinstance(pipeline, dict)
+                for status in ((pipeline.get("_embedded") or {}).get("statuses") or ())
+                if status and isinstance(status, dict) and status.get("id") and status.get("name")
+            }
+
+    _STAGE_MAP_CACHE["source"] = pipelines_data
+    _STAGE_MAP_CACHE["stage_map"] = stage_map
+    return stage_map
+
+# Mapas id -> nome derivados das respostas de referência (sources, tags, users). Como
+# _cached_reference devolve o mesmo objeto enquanto o cache vale, o mapa é reconstruído
+# só quando a resposta muda. Os mapas são compartilhados e não devem ser alterados.
+_NAME_MAP_CACHE = {}
+
+def _build_name_map(data, collection: str) -> dict:
+    """Mapeia id -> name dos itens em data["_embedded"][collection]"""
+    cached = _NAME_MAP_CACHE.get(collection)
+    if cached is not None and cached[0] is data:
+        return cached[1]
+
+    name_map = {}
+    if data and "_embedded" in data:
+        name_map = {item["id"]: item["name"] for item in data["_embedded"].get(collection, [])}
+
+    _NAME_MAP_CACHE[collection] = (data, name_map)
+    return name_map
+
+# Classificação de status para os contadores de vendas (142 = Won, 143 = Lost, demais = Active)
+STATUS_BUCKET = {142: "won", 143: "lost"}
+
+# Nome do status exibido nas tabelas detalhadas (demais status = "Ativo")
+STATUS_NAME_MAP = {
+    142: "Venda Concluída",
+    143: "Perdido",
+    80689759: "Contrato Assinado",
+    **dict.fromkeys((80689711, 80689715, 80689719, 80689723, 80689727), "Em Negociação"),
+}
+
+def _aggregate_sales_leads(leads, get_fields) -> dict:
+    """
+    Agrega os leads do dashboard de vendas em uma única passada: contagem por status_id
+    (também usada para os estágios), por corretor e por fonte, receita das vendas ganhas
+    e soma/quantidade dos tempos de ciclo. leads já deve conter apenas dicts;
+    get_fields(lead) retorna o dict {field_id: valor} dos custom fields.
+    """
+    status_counts = Counter()
+    source_counts = Counter()
+    corretor_counts = {}
+    total_revenue = 0
+    cycle_time_sum = 0.0
+    cycle_time_count = 0
+
+    for lead in leads:
+        get = lead.get
+        status_id = get("status_id")
+        status_counts[status_id] += 1
+
+        fields = get_fields(lead)
+        corretor_name = fields.get(837920) or "Sem corretor"  # Corretor
+        fonte_name = fields.get(837886) or "Fonte Desconhecida"  # Fonte
+        source_counts[fonte_name] += 1
+
+        # Uma única busca no dicionário por lead; incrementos via referência local
+        counts = corretor_counts.get(corretor_name)
+        if counts is None:
+            counts = {
+                "total": 0,
+                "active": 0,
+                "lost": 0,
+                "won": 0
+            }
+            corretor_counts[corretor_name] = counts
+        counts["total"] += 1
+
+        # Verificar status do lead (uma busca em STATUS_BUCKET em vez de comparações encadeadas)
+        bucket = STATUS_BUCKET.get(status_id, "active")
+        counts[bucket] += 1
+        if bucket == "won":
+            total_revenue += get("price", 0) or 0
+
+            # Tempo de ciclo (dias entre criação e fechamento)
+            closed_at = get("closed_at")
+            created_at = get("created_at")
+            if (closed_at and created_at and
+                    isinstance(closed_at, (int, float)) and isinstance(created_at, (int, float))):
+                cycle_time = (closed_at - created_at) / (24 * 60 * 60)
+                if cycle_time > 0:
+                    cycle_time_sum += cycle_time
+                    cycle_time_count += 1
+
+    return {
+        "status_counts": status_counts,
+        "source_counts": source_counts,
+        "corretor_counts": corretor_counts,
+        "total_revenue": total_revenue,
+        "cycle_time_sum": cycle_time_sum,
+        "cycle_time_count": cycle_time_count,
+    }
+
+def _build_leads_by_user(corretor_counts: dict, meetings_by_corretor) -> list:
+    """Monta o array leadsByUser a partir das contagens por corretor e das reuniões REAIS por corretor"""
+    leads_by_user = []
+    for corretor_name, counts in corretor_counts.items():
+        real_meetings = meetings_by_corretor.get(corretor_name, 0)
+        leads_by_user.append({
+            "name": corretor_name,
+            "value": counts["total"],
+            "active": counts["active"],
+            "lost": counts["lost"],
+            "meetings": real_meetings,  # DADOS REAIS
+            "meetingsHeld": real_meetings,  # DADOS REAIS
+            "sales": counts["won"]
+        })
+    return leads_by_user
+
+@router.get("/marketing-complete", response_class=ORJSONResponse)
+@_ttl_response_cache()
 async def get_marketing_dashboard_complete(
+    request: Request,
     days: int = Query(90, description="Período em dias para análise"),
     start_date: Optional[str] = Query(None, description="Data de início (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Data de fim (YYYY-MM-DD)"),
@@ -47,26 +433,10 @@ async def get_marketing_dashboard_complete(
     - /analytics/trends
     """
     try:
-        logger.info(f"Iniciando dashboard marketing completo para {days} dias, start_date: {start_date}, end_date: {end_date}, fonte: {fonte}")
+        logger.info("Iniciando dashboard marketing completo para %s dias, start_date: %s, end_date: %s, fonte: %s", days, start_date, end_date, fonte)
         
         # Calcular parâmetros de tempo
-        import time
-        
-        if start_date and end_date:
-            # Usar datas específicas
-            try:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)  # Fim do dia
-                start_time = int(start_dt.timestamp())
-                end_time = int(end_dt.timestamp())
-            except ValueError as date_error:
-                logger.error(f"Erro de validação de data: {date_error}")
-                raise HTTPException(status_code=400, detail="Formato de data inválido. Use YYYY-MM-DD")
-        else:
-            # Usar período relativo em dias
-            end_time = int(time.time())
-            start_time = end_time - (days * 24 * 60 * 60)
+        start_time, end_time = build_time_window(days, start_date, end_date)
         
         # CORREÇÃO: Buscar apenas pipelines Vendas + Remarketing (igual charts/leads-by-user)
         # IDs importantes (definidos depois no código)
@@ -90,170 +460,111 @@ async def get_marketing_dashboard_complete(
             "with": "contacts,tags,custom_fields_values"
         }
         
-        # Buscar dados de ambos os pipelines - USAR PAGINAÇÃO COMPLETA
-        try:
-            leads_vendas_all = kommo_api.get_all_leads_old(leads_vendas_params)
-            leads_vendas_data = {"_embedded": {"leads": leads_vendas_all}}
-            logger.info(f"Leads Vendas (paginação completa): {len(leads_vendas_all)}")
-        except Exception as e:
-            logger.error(f"Erro ao buscar leads vendas: {e}")
-            leads_vendas_data = {"_embedded": {"leads": []}}
+        # Buscar leads de ambos os pipelines (páginas em paralelo via aiohttp) + sources + tags
+        # ao mesmo tempo. Sources/tags usam o cliente síncrono em threads (rate limiter thread-safe).
+        leads_results, sources_data, tags_data = await asyncio.gather(
+            _cached_leads_window([leads_vendas_params, leads_remarketing_params]),
+            _cached_reference("kommo:sources", 600, kommo_api.get_sources),
+            _cached_reference("kommo:tags", 600, kommo_api.get_tags),
+            return_exceptions=True
+        )
 
-        try:
-            leads_remarketing_all = kommo_api.get_all_leads_old(leads_remarketing_params)
-            leads_remarketing_data = {"_embedded": {"leads": leads_remarketing_all}}
-            logger.info(f"Leads Remarketing (paginação completa): {len(leads_remarketing_all)}")
-        except Exception as e:
-            logger.error(f"Erro ao buscar leads remarketing: {e}")
-            leads_remarketing_data = {"_embedded": {"leads": []}}
-        
-        # Combinar leads de ambos os pipelines
-        combined_leads = []
-        if leads_vendas_data and "_embedded" in leads_vendas_data:
-            vendas_leads = leads_vendas_data["_embedded"].get("leads", [])
-            if isinstance(vendas_leads, list):
-                combined_leads.extend(vendas_leads)
-                
-        if leads_remarketing_data and "_embedded" in leads_remarketing_data:
-            remarketing_leads = leads_remarketing_data["_embedded"].get("leads", [])
-            if isinstance(remarketing_leads, list):
-                combined_leads.extend(remarketing_leads)
-        
-        # Criar estrutura similar ao original para compatibilidade
-        leads_data = {"_embedded": {"leads": combined_leads}}
-        sources_data = safe_get_data(kommo_api.get_sources)
-        tags_data = safe_get_data(kommo_api.get_tags)
-        
-        # Processar contagem de leads
+        if isinstance(leads_results, Exception):
+            logger.error("Erro ao buscar leads em paralelo: %s", leads_results)
+            # Fallback (página com falha na busca async): paginação sequencial completa no
+            # cliente síncrono, um pipeline por thread
+            leads_vendas_all, leads_remarketing_all = await asyncio.gather(
+                asyncio.to_thread(kommo_api.get_all_leads_old, leads_vendas_params),
+                asyncio.to_thread(kommo_api.get_all_leads_old, leads_remarketing_params),
+                return_exceptions=True
+            )
+        else:
+            leads_vendas_all = leads_results[0] if len(leads_results) > 0 else []
+            leads_remarketing_all = leads_results[1] if len(leads_results) > 1 else []
+
+        if isinstance(leads_vendas_all, Exception) or not isinstance(leads_vendas_all, list):
+            logger.error("Erro ao buscar leads vendas: %s", leads_vendas_all)
+            leads_vendas_all = []
+        else:
+            logger.info("Leads Vendas (paginação completa): %d", len(leads_vendas_all))
+
+        if isinstance(leads_remarketing_all, Exception) or not isinstance(leads_remarketing_all, list):
+            logger.error("Erro ao buscar leads remarketing: %s", leads_remarketing_all)
+            leads_remarketing_all = []
+        else:
+            logger.info("Leads Remarketing (paginação completa): %d", len(leads_remarketing_all))
+
+        # safe_get_data já trata erros, mas gather pode propagar cancelamentos/erros da thread
+        if isinstance(sources_data, Exception):
+            logger.error("Erro ao buscar sources: %s", sources_data)
+            sources_data = {}
+        if isinstance(tags_data, Exception):
+            logger.error("Erro ao buscar tags: %s", tags_data)
+            tags_data = {}
+        
+        # Preparar mapeamentos de sources (fallback) e tags uma vez só
+        sources_map = _build_name_map(sources_data, "sources")
+        tags_map = _build_name_map(tags_data, "tags")
+
+        # Filtro de fonte (suporta múltiplas fontes separadas por vírgula)
+        fonte_filter = _parse_filter_values(fonte)
+
+        # Uma única passada pelos leads calcula: total (com filtro de fonte),
+        # leads por fonte (CUSTOM FIELD "Fonte" - ID: 837886) e leads por tag
+        # (itera os dois pipelines encadeados, sem materializar uma lista combinada)
+        all_leads = filter(None, chain(leads_vendas_all, leads_remarketing_all))
         total_leads = 0
-        if leads_data and "_embedded" in leads_data:
-            all_leads = leads_data["_embedded"].get("leads", [])
-            if fonte and isinstance(fonte, str) and fonte.strip():
-                # Contar apenas leads da fonte especificada
-                filtered_leads = []
-                for lead in all_leads:
-                    fonte_name = None
-                    custom_fields = lead.get("custom_fields_values", [])
-                    
-                    # Buscar custom field "Fonte" (ID: 837886)
-                    if custom_fields and isinstance(custom_fields, list):
-                        for field in custom_fields:
-                            if field and field.get("field_id") == 837886:
-                                values = field.get("values", [])
-                                if values and len(values) > 0:
-                                    fonte_name = values[0].get("value")
-                                    break
-                    
-                    # Suporta múltiplas fontes separadas por vírgula
-                    if fonte and ',' in fonte:
-                        fontes_list = [f.strip() for f in fonte.split(',')]
-                        if fonte_name in fontes_list:
-                            filtered_leads.append(lead)
-                    else:
-                        if fonte_name == fonte:
-                            filtered_leads.append(lead)
-                
-                total_leads = len(filtered_leads)
-            else:
-                total_leads = len(all_leads)
-                if "_total_items" in leads_data:
-                    total_leads = leads_data["_total_items"]
-        
-        # Processar leads por fonte usando CUSTOM FIELD "Fonte" (ID: 837886) - mais detalhado
-        leads_by_source_array = []
-        
-        # Preparar mapeamento de sources uma vez só (fallback)
-        sources_map = {}
-        if sources_data and "_embedded" in sources_data:
-            for source in sources_data["_embedded"].get("sources", []):
-                sources_map[source["id"]] = source["name"]
-        
-        if leads_data and "_embedded" in leads_data:
-            source_counts = {}
-            
-            for lead in leads_data["_embedded"].get("leads", []):
-                fonte_name = None
-                custom_fields = lead.get("custom_fields_values", [])
-                
-                # Buscar custom field "Fonte" (ID: 837886)
-                if custom_fields and isinstance(custom_fields, list):
-                    for field in custom_fields:
-                        if field and field.get("field_id") == 837886:  # ID do campo Fonte
-                            values = field.get("values", [])
-                            if values and len(values) > 0:
-                                fonte_name = values[0].get("value")
-                                break
-                
-                # Se não tiver custom field, usar source_id padrão como fallback
-                if not fonte_name:
-                    # Tentar obter source_id do lead
-                    source_id = lead.get("source_id")
-                    if not source_id and lead.get("_embedded", {}).get("source"):
-                        source_id = lead["_embedded"]["source"]["id"]
-                        
-                    if source_id and source_id in sources_map:
-                        fonte_name = sources_map[source_id]
-                    else:
-                        fonte_name = "Fonte Desconhecida"
-                
-                # Filtrar por fonte se especificado
-                if fonte and isinstance(fonte, str) and fonte.strip() and fonte_name != fonte:
-                    continue
-                
-                source_counts[fonte_name] = source_counts.get(fonte_name, 0) + 1
-            
-            # Ordenar por quantidade (mais importantes primeiro)
-            if source_counts:
-                sorted_sources = sorted(source_counts.items(), key=lambda x: x[1], reverse=True)
-                leads_by_source_array = [
-                    {"name": name, "value": count}
-                    for name, count in sorted_sources
-                ]
-                
-            logger.info(f"Leads por fonte (custom field): {len(leads_by_source_array)} fontes encontradas")
-        
-        # Processar leads por tag - similar ao endpoint /leads/by-tag  
-        leads_by_tag_array = []
-        tags_map = {}
-        
-        if tags_data and "_embedded" in tags_data:
-            # Mapear IDs de tag para nomes
-            for tag in tags_data["_embedded"].get("tags", []):
-                tags_map[tag["id"]] = tag["name"]
-        
-        if leads_data and "_embedded" in leads_data:
-            tag_counts = {}
-            for lead in leads_data["_embedded"].get("leads", []):
-                lead_tags = lead.get("_embedded", {}).get("tags", [])
-                if lead_tags:
-                    for tag in lead_tags:
-                        tag_id = tag.get("id")
-                        if tag_id:
-                            tag_name = tags_map.get(tag_id, f"Tag {tag_id}")
-                            tag_counts[tag_name] = tag_counts.get(tag_name, 0) + 1
-            
-            leads_by_tag_array = [
-                {"name": name, "value": count}
-                for name, count in tag_counts.items()
-            ]
-        
-        # Métricas do Facebook removidas - dados zerados
-        facebook_metrics = {
-            "impressions": 0,
-            "reach": 0,
-            "clicks": 0,
-            "ctr": 0,
-            "cpc": 0,
-            "totalSpent": 0,
-            "costPerLead": 0,
-            "engagement": {
-                "likes": 0,
-                "comments": 0,
-                "shares": 0,
-                "videoViews": 0,
-                "profileVisits": 0
-            }
-        }
+        source_counts = Counter()
+        tag_counts = Counter()
+
+        CUSTOM_FIELD_FONTE = 837886
+        FONTE_FIELD_IDS = frozenset({CUSTOM_FIELD_FONTE})
+
+        for lead in all_leads:
+            # Buscar custom field "Fonte" (ID: 837886)
+            fonte_name = extract_custom_fields(lead, FONTE_FIELD_IDS).get(CUSTOM_FIELD_FONTE)
+
+            # Total de leads: apenas os da fonte especificada (pelo custom field)
+            if fonte_filter is None or fonte_name in fonte_filter:
+                total_leads += 1
+
+            # Se não tiver custom field, usar source_id padrão como fallback
+            if not fonte_name:
+                # Tentar obter source_id do lead
+                source_id = lead.get("source_id")
+                if not source_id and lead.get("_embedded", {}).get("source"):
+                    source_id = lead["_embedded"]["source"]["id"]
+
+                if source_id and source_id in sources_map:
+                    fonte_name = sources_map[source_id]
+                else:
+                    fonte_name = "Fonte Desconhecida"
+
+            # Leads por fonte (filtrando por fonte se especificado; aqui a comparação é exata,
+            # sem separar por vírgula, como sempre foi neste endpoint)
+            if fonte_filter is None or fonte_name == fonte:
+                source_counts[fonte_name] += 1
+
+            # Leads por tag - similar ao endpoint /leads/by-tag (sem filtro de fonte)
+            lead_tags = lead.get("_embedded", {}).get("tags", [])
+            if lead_tags:
+                for tag in lead_tags:
+                    tag_id = tag.get("id")
+                    if tag_id:
+                        tag_name = tags_map.get(tag_id, f"Tag {tag_id}")
+                        tag_counts[tag_name] += 1
+
+        # Ordenar por quantidade (mais importantes primeiro)
+        leads_by_source_array = [
+            {"name": name, "value": count}
+            for name, count in source_counts.most_common()
+        ]
+        logger.info("Leads por fonte (custom field): %d fontes encontradas", len(leads_by_source_array))
+
+        leads_by_tag_array = [
+            {"name": name, "value": count}
+            for name, count in tag_counts.items()
+        ]
         
         # Tendência simples baseada nos leads obtidos
         metrics_trend = []
@@ -264,25 +575,19 @@ async def get_marketing_dashboard_complete(
             "leadsBySource": leads_by_source_array,  # USANDO CUSTOM FIELD "Fonte"
             "leadsByTag": leads_by_tag_array,
             "leadsByAd": [],  # TODO: Implementar por anúncio específico
-            "facebookMetrics": facebook_metrics,
+            "facebookMetrics": _EMPTY_FACEBOOK_METRICS,  # Métricas do Facebook removidas - dados zerados
             "facebookCampaigns": [],
             "metricsTrend": metrics_trend,
             "customFields": {  # NOVO: Custom fields implementados
                 "fonte": leads_by_source_array,
-                "available_fontes": [
-                    "Tráfego Meta", "Escritório Patacho", "Canal Pro", "Site", 
-                    "Redes Sociais", "Parceria com Construtoras", "Ação de Panfletagem",
-                    "Eletromídia", "Orgânico", "LandingPage", "Chamada", "Anúncio Físico",
-                    "Não atribuído", "Google", "Cliente", "Grupo Zap", "Celular do Plantão",
-                    "Tráfego Séculos"
-                ]
+                "available_fontes": AVAILABLE_FONTES
             },
             "analyticsOverview": None,  # Removido por otimização
             
             # Metadados de performance
             "_metadata": {
                 "period_days": days,
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": _iso_now(int(time.time())),
                 "data_sources": ["kommo_api"],
                 "optimized": True,
                 "single_request": True,
@@ -291,19 +596,22 @@ async def get_marketing_dashboard_complete(
             }
         }
         
-        logger.info(f"Dashboard marketing completo gerado com sucesso: {total_leads} leads, {len(leads_by_source_array)} fontes, {len(leads_by_tag_array)} tags")
-        return response
+        logger.info("Dashboard marketing completo gerado com sucesso: %d leads, %d fontes, %d tags",
+                    total_leads, len(leads_by_source_array), len(leads_by_tag_array))
+        return ORJSONResponse(response)
         
     except HTTPException:
         # Re-raise HTTPExceptions (como 400 Bad Request) sem modificar
         raise
     except Exception as e:
-        logger.error(f"Erro ao gerar dashboard marketing completo: {str(e)}")
+        logger.error("Erro ao gerar dashboard marketing completo: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
-@router.get("/sales-complete")
+@router.get("/sales-complete", response_class=ORJSONResponse)
+@_ttl_response_cache()
 async def get_sales_dashboard_complete(
+    request: Request,
     days: int = Query(90, description="Período em dias para análise"),
     corretor: Optional[str] = Query(None, description="Nome do corretor para filtrar dados"),
     start_date: Optional[str] = Query(None, description="Data de início (YYYY-MM-DD)"),
@@ -329,26 +637,10 @@ async def get_sales_dashboard_complete(
     - /analytics/team-performance
     """
     try:
-        logger.info(f"Iniciando dashboard vendas completo para {days} dias, corretor: {corretor}, start_date: {start_date}, end_date: {end_date}, fonte: {fonte}")
+        logger.info("Iniciando dashboard vendas completo para %s dias, corretor: %s, start_date: %s, end_date: %s, fonte: %s", days, corretor, start_date, end_date, fonte)
         
         # Calcular parâmetros de tempo
-        import time
-        
-        if start_date and end_date:
-            # Usar datas específicas
-            try:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)  # Fim do dia
-                start_time = int(start_dt.timestamp())
-                end_time = int(end_dt.timestamp())
-            except ValueError as date_error:
-                logger.error(f"Erro de validação de data: {date_error}")
-                raise HTTPException(status_code=400, detail="Formato de data inválido. Use YYYY-MM-DD")
-        else:
-            # Usar período relativo em dias
-            end_time = int(time.time())
-            start_time = end_time - (days * 24 * 60 * 60)
+        start_time, end_time = build_time_window(days, start_date, end_date)
         
         # CORREÇÃO: Buscar leads APENAS dos pipelines Vendas + Remarketing (igual charts/leads-by-user)
         # IDs dos pipelines necessários
@@ -377,284 +669,206 @@ async def get_sales_dashboard_complete(
         }
         
         # Calcular filtro de reuniões: incluir 23:59 do dia anterior (igual charts/leads-by-user)
-        meetings_start_time = start_time - (24 * 60 * 60) + (23 * 60 * 60 + 59 * 60)  # -1 dia + 23:59
+        meetings_start_time = start_time - SECONDS_PER_DAY + (23 * 60 * 60 + 59 * 60)  # -1 dia + 23:59
         
         # Parâmetros para buscar reuniões REAIS
         tasks_params = {
             'filter[task_type_id]': 2,  # Tipo de tarefa: reunião
             'filter[is_completed]': 1,  # Apenas concluídas
+            'filter[entity_type]': 'leads',  # Apenas tarefas vinculadas a leads (filtro no servidor)
             'filter[complete_till][from]': meetings_start_time,  # IGUAL CHARTS
             'filter[complete_till][to]': end_time,
             'limit': 250
         }
         
         # Buscar dados REAIS - USAR ASYNC PARALELO para performance
-        import time as perf_time
-        perf_start = perf_time.time()
+        perf_start = time.time()
 
         try:
             # OTIMIZAÇÃO: Buscar leads E tasks em paralelo simultaneamente
             params_list = [leads_vendas_params, leads_remarketing_params]
 
             # Criar tasks assíncronas para rodar em paralelo
-            leads_task = kommo_api.get_all_leads_parallel_async(params_list, max_pages=15)
+            leads_task = _cached_leads_window(params_list)
             tasks_task = kommo_api.get_all_tasks_async(tasks_params, max_pages=10)
+            # Usuários (cache em processo ou cliente síncrono em uma thread), sobrepondo com leads/tasks
+            users_task = _cached_reference("kommo:users", 300, kommo_api.get_users)
 
-            # Executar ambas em paralelo
-            leads_results, all_tasks = await asyncio.gather(leads_task, tasks_task, return_exceptions=True)
+            # Executar todas em paralelo
+            leads_results, all_tasks, users_data = await asyncio.gather(leads_task, tasks_task, users_task, return_exceptions=True)
+
+            # Fallbacks no cliente síncrono (paginação sequencial), cada um em uma thread e em paralelo entre si
+            fallbacks = {}
 
             # Processar resultados de leads
             if isinstance(leads_results, Exception):
-                logger.error(f"Erro ao buscar leads em paralelo: {leads_results}")
-                all_leads_vendas = kommo_api.get_all_leads_old(leads_vendas_params)
-                all_leads_remarketing = kommo_api.get_all_leads_old(leads_remarketing_params)
+                logger.error("Erro ao buscar leads em paralelo: %s", leads_results)
+                fallbacks["vendas"] = asyncio.to_thread(kommo_api.get_all_leads_old, leads_vendas_params)
+                fallbacks["remarketing"] = asyncio.to_thread(kommo_api.get_all_leads_old, leads_remarketing_params)
             else:
                 all_leads_vendas = leads_results[0] if len(leads_results) > 0 else []
                 all_leads_remarketing = leads_results[1] if len(leads_results) > 1 else []
 
             # Processar resultados de tasks
             if isinstance(all_tasks, Exception):
-                logger.error(f"Erro ao buscar tasks em paralelo: {all_tasks}")
-                all_tasks = kommo_api.get_all_tasks(tasks_params)
-
-            perf_elapsed = perf_time.time() - perf_start
-            logger.info(f"[PERF] Leads+Tasks buscados em paralelo: Vendas={len(all_leads_vendas)}, Remarketing={len(all_leads_remarketing)}, Tasks={len(all_tasks)} em {perf_elapsed:.2f}s")
+                logger.error("Erro ao buscar tasks em paralelo: %s", all_tasks)
+                fallbacks["tasks"] = asyncio.to_thread(kommo_api.get_all_tasks, tasks_params)
+
+            if fallbacks:
+                fallback_results = dict(zip(fallbacks, await asyncio.gather(*fallbacks.values())))
+                if "vendas" in fallback_results:
+                    all_leads_vendas = fallback_results["vendas"]
+                    all_leads_remarketing = fallback_results["remarketing"]
+                all_tasks = fallback_results.get("tasks", all_tasks)
+
+            perf_elapsed = time.time() - perf_start
+            logger.info("[PERF] Leads+Tasks buscados em paralelo: Vendas=%d, Remarketing=%d, Tasks=%d em %.2fs",
+                        len(all_leads_vendas), len(all_leads_remarketing), len(all_tasks), perf_elapsed)
         except Exception as e:
-            logger.error(f"Erro ao buscar dados em paralelo: {e}")
-            # Fallback para método sequencial
-            all_leads_vendas = kommo_api.get_all_leads_old(leads_vendas_params)
-            all_leads_remarketing = kommo_api.get_all_leads_old(leads_remarketing_params)
-            all_tasks = kommo_api.get_all_tasks(tasks_params)
-
-        # Combinar leads de ambos os pipelines
-        all_leads = all_leads_vendas + all_leads_remarketing
-        leads_data = {"_embedded": {"leads": all_leads}}
+            logger.error("Erro ao buscar dados em paralelo: %s", e)
+            # Fallback para o cliente síncrono: pipelines, tasks e usuários em threads paralelas
+            all_leads_vendas, all_leads_remarketing, all_tasks, users_data = await asyncio.gather(
+                asyncio.to_thread(kommo_api.get_all_leads_old, leads_vendas_params),
+                asyncio.to_thread(kommo_api.get_all_leads_old, leads_remarketing_params),
+                asyncio.to_thread(kommo_api.get_all_tasks, tasks_params),
+                _cached_reference("kommo:users", 300, kommo_api.get_users)
+            )
+
+        # Combinar leads de ambos os pipelines, mantendo apenas leads válidos uma única vez
+        # (os loops abaixo não repetem a checagem)
+        all_leads = [lead for lead in chain(all_leads_vendas, all_leads_remarketing) if isinstance(lead, dict)]
         tasks_data = {"_embedded": {"tasks": all_tasks}}
-        logger.info(f"[PERF] Total leads combinados: {len(all_leads)}, tasks: {len(all_tasks)}")
+        logger.info("[PERF] Total leads combinados: %d, tasks: %d", len(all_leads), len(all_tasks))
 
-        # Buscar usuários para fallback
-        try:
-            users_data = kommo_api.get_users()
-        except Exception as e:
-            logger.error(f"Erro ao buscar usuarios: {e}")
+        # Usuários para fallback (buscados junto com leads/tasks)
+        if isinstance(users_data, Exception):
+            logger.error("Erro ao buscar usuarios: %s", users_data)
             users_data = {"_embedded": {"users": []}}
-        
-        # Função para filtrar leads por corretor usando custom field (igual aos outros endpoints)
-        def filter_leads_by_corretor(leads: list, corretor_name) -> list:
-            """Filtra leads pelo campo personalizado 'Corretor' (field_id: 837920)"""
-            # Garantir que corretor_name seja string
-            if not corretor_name or not isinstance(corretor_name, str) or not leads:
-                return leads if leads else []
-            
-            filtered_leads = []
-            for lead in leads:
-                if not lead:
-                    continue
-                    
-                custom_fields = lead.get("custom_fields_values", [])
-                if not custom_fields:
-                    continue
-                    
-                if custom_fields and isinstance(custom_fields, list):
-                    for field in custom_fields:
-                        if not field:
-                            continue
-                        
-                        if field.get("field_id") == 837920:  # ID do campo Corretor
-                            values = field.get("values", [])
-                            if values and len(values) > 0:
-                                value = values[0].get("value") if values[0] else None
-                                # Suporta múltiplos corretores separados por vírgula
-                                if corretor_name and ',' in corretor_name:
-                                    corretores_list = [c.strip() for c in corretor_name.split(',')]
-                                    if value in corretores_list:
-                                        filtered_leads.append(lead)
-                                        break
-                                else:
-                                    if value == corretor_name:
-                                        filtered_leads.append(lead)
-                                        break
-            
-            return filtered_leads
-        
-        # Função para filtrar leads por fonte usando custom field
-        def filter_leads_by_fonte(leads: list, fonte_name) -> list:
-            """Filtra leads pelo campo personalizado 'Fonte' (field_id: 837886)"""
-            # Garantir que fonte_name seja string
-            if not fonte_name or not isinstance(fonte_name, str) or not leads:
-                return leads if leads else []
-            
-            filtered_leads = []
-            for lead in leads:
-                if not lead:
-                    continue
-                    
-                custom_fields = lead.get("custom_fields_values", [])
-                if not custom_fields:
-                    continue
-                    
-                if custom_fields and isinstance(custom_fields, list):
-                    for field in custom_fields:
-                        if not field:
-                            continue
-                        
-                        if field.get("field_id") == 837886:  # ID do campo Fonte
-                            values = field.get("values", [])
-                            if values and len(values) > 0:
-                                value = values[0].get("value") if values[0] else None
-                                if value == fonte_name:
-                                    filtered_leads.append(lead)
-                                    break
-            
-            return filtered_leads
-        
-        # Obter lista de leads com proteção
-        all_leads = []
-        try:
-            logger.info(f"Processando leads_data: type={type(leads_data)}, keys={list(leads_data.keys()) if isinstance(leads_data, dict) else 'N/A'}")
-            if leads_data and isinstance(leads_data, dict) and "_embedded" in leads_data:
-                embedded = leads_data["_embedded"]
-                logger.info(f"Embedded type: {type(embedded)}, keys: {list(embedded.keys()) if isinstance(embedded, dict) else 'N/A'}")
-                if embedded and isinstance(embedded, dict):
-                    leads_raw = embedded.get("leads", [])
-                    logger.info(f"Leads raw type: {type(leads_raw)}, length: {len(leads_raw) if isinstance(leads_raw, list) else 'N/A'}")
-                    if leads_raw and isinstance(leads_raw, list):
-                        # Filtrar apenas leads válidos (não None)
-                        all_leads = [lead for lead in leads_raw if lead is not None]
-                        logger.info(f"Leads processados: {len(all_leads)} válidos de {len(leads_raw)} totais")
-                    else:
-                        logger.warning(f"Leads raw inválido: {type(leads_raw)}")
-                else:
-                    logger.warning(f"Embedded inválido: {type(embedded)}")
-            else:
-                logger.warning(f"Leads data inválido: {type(leads_data)}")
-        except Exception as e:
-            logger.error(f"Erro ao processar leads: {e}")
-            all_leads = []
-        
-        # Se corretor específico, filtrar leads por esse corretor
-        if corretor and all_leads:
-            try:
-                filtered_leads = filter_leads_by_corretor(all_leads, corretor)
-                if filtered_leads is not None and isinstance(filtered_leads, list):
-                    all_leads = filtered_leads
-                else:
-                    all_leads = []
-                logger.info(f"Filtrando por corretor '{corretor}': {len(all_leads)} leads encontrados")
-            except Exception as filter_error:
-                logger.error(f"Erro ao filtrar por corretor: {filter_error}")
-                all_leads = []
-        
-        # Se fonte específica, filtrar leads por essa fonte
-        if fonte and all_leads:
+        elif users_data is None:
+            # Cache em processo ou cliente síncrono em uma thread (não bloqueia o event loop)
+            users_data = await _cached_reference("kommo:users", 300, kommo_api.get_users) or {"_embedded": {"users": []}}
+        
+        # Indexar os custom fields usados neste endpoint uma única vez por lead (por ID do lead,
+        # sem alterar o dict do lead); reutilizado no filtro, nas reuniões e no agrupamento por corretor
+        SALES_FIELD_IDS = frozenset({CUSTOM_FIELD_CORRETOR, CUSTOM_FIELD_FONTE, CUSTOM_FIELD_PRODUTO})
+        lead_fields_index = {}
+
+        def get_lead_fields(lead) -> dict:
+            # Leads sem custom fields (comuns) não passam pela varredura nem ocupam o índice
+            if not lead.get("custom_fields_values"):
+                return _NO_CUSTOM_FIELDS
+            lead_id = lead.get("id")
+            fields = lead_fields_index.get(lead_id)
+            if fields is None:
+                fields = extract_custom_fields(lead, SALES_FIELD_IDS)
+                if lead_id is not None:
+                    lead_fields_index[lead_id] = fields
+            return fields
+
+        # Leads válidos antes do filtro (base do mapa de leads das reuniões)
+        valid_leads = all_leads
+
+        # Filtrar por corretor e fonte em uma única passada pelos leads (pertinência via frozenset)
+        corretor_filter = _parse_filter_values(corretor)
+        fonte_filter = _parse_filter_values(fonte)
+        produto_filter = _parse_filter_values(produto)
+
+        if (corretor_filter is not None or fonte_filter is not None) and all_leads:
+            def lead_matches_filters(lead) -> bool:
+                fields = get_lead_fields(lead)
+                return ((corretor_filter is None or fields.get(CUSTOM_FIELD_CORRETOR) in corretor_filter) and
+                        (fonte_filter is None or fields.get(CUSTOM_FIELD_FONTE) in fonte_filter))
+
             try:
-                filtered_leads = filter_leads_by_fonte(all_leads, fonte)
-                if filtered_leads is not None and isinstance(filtered_leads, list):
-                    all_leads = filtered_leads
-                else:
-                    all_leads = []
-                logger.info(f"Filtrando por fonte '{fonte}': {len(all_leads)} leads encontrados")
+                all_leads = [lead for lead in all_leads if lead_matches_filters(lead)]
+                logger.info("Filtrando por corretor '%s' e fonte '%s': %d leads encontrados", corretor, fonte, len(all_leads))
             except Exception as filter_error:
-                logger.error(f"Erro ao filtrar por fonte: {filter_error}")
+                logger.error("Erro ao filtrar por corretor/fonte: %s", filter_error)
                 all_leads = []
         
         # Processar contagem de leads (após filtro se aplicável)
         total_leads = len(all_leads) if all_leads else 0
+
+        # Agregar leads em uma única passada (status, corretor, fonte, receita e ciclo)
+        aggregates = _aggregate_sales_leads(all_leads, get_lead_fields)
+
+        # Contagem por status (142 = ganho, 143 = perdido, demais = ativo)
+        status_counts = aggregates["status_counts"]
+        won_leads_count = status_counts[142]
+        lost_leads_count = status_counts[143]
+        active_leads_count = sum(status_counts.values()) - won_leads_count - lost_leads_count
         
         # Criar mapa de usuários
-        users_map = {}
-        if users_data and "_embedded" in users_data:
-            for user in users_data["_embedded"].get("users", []):
-                users_map[user["id"]] = user["name"]
+        users_map = _build_name_map(users_data, "users")
         
         # NOVO: Criar mapa de leads para busca rápida das reuniões (igual charts/leads-by-user)
-        leads_map = {}
-        if leads_data and "_embedded" in leads_data:
-            for lead in leads_data["_embedded"].get("leads", []):
-                if lead and lead.get("id"):
-                    leads_map[lead.get("id")] = lead
+        leads_map = {lead["id"]: lead for lead in valid_leads if lead.get("id")}
         
         # NOVO: Processar reuniões REAIS e contar por corretor (igual charts/leads-by-user)
-        meetings_by_corretor = {}
+        meetings_by_corretor = Counter()
         if tasks_data and "_embedded" in tasks_data:
             reunion_tasks = tasks_data["_embedded"].get("tasks", [])
-            logger.info(f"Processando {len(reunion_tasks)} tarefas de reunião")
+            logger.info("Processando %d tarefas de reunião", len(reunion_tasks))
             
-            # Coletar IDs de leads que não estão no mapa atual
-            missing_lead_ids = set()
+            def count_meeting(lead):
+                # Extrair corretor do lead (mesma lógica dos leads, via índice de custom fields)
+                fields = get_lead_fields(lead)
+                corretor_lead = fields.get(CUSTOM_FIELD_CORRETOR)
+                
+                # Aplicar filtros APENAS se especificados (mesmos frozensets do filtro de leads)
+                if corretor_filter is not None and corretor_lead not in corretor_filter:
+                    return
+                if fonte_filter is not None and fields.get(CUSTOM_FIELD_FONTE) not in fonte_filter:
+                    return
+                if produto_filter is not None and fields.get(CUSTOM_FIELD_PRODUTO) not in produto_filter:
+                    return
+                
+                # Determinar corretor final (mesma lógica dos leads) e contar a reunião
+                final_corretor = corretor_lead or users_map.get(lead.get("responsible_user_id"), "Usuário Sem Nome")
+                meetings_by_corretor[final_corretor] += 1
+            
+            # Uma única passada pelas tarefas: reuniões com lead já no mapa são contadas agora;
+            # as demais ficam pendentes até a busca dos leads faltantes
+            pending_lead_ids = []
             for task in reunion_tasks:
-                if task and task.get('entity_type') == 'leads':
-                    lead_id = task.get('entity_id')
-                    if lead_id and lead_id not in leads_map:
-                        missing_lead_ids.add(lead_id)
+                if not task or task.get('entity_type') != 'leads':
+                    continue
+                lead_id = task.get('entity_id')
+                lead = leads_map.get(lead_id)
+                if lead:
+                    count_meeting(lead)
+                elif lead_id:
+                    pending_lead_ids.append(lead_id)
             
             # Buscar leads faltantes se necessário - OTIMIZADO: busca em paralelo
+            missing_lead_ids = set(pending_lead_ids)
             if missing_lead_ids:
-                logger.info(f"Buscando {len(missing_lead_ids)} leads adicionais para reuniões em paralelo")
+                logger.info("Buscando %d leads adicionais para reuniões em paralelo", len(missing_lead_ids))
                 try:
-                    # Usar busca em paralelo para performance
-                    additional_leads = await kommo_api.get_leads_batch_async(list(missing_lead_ids))
+                    # Lotes de IDs via filter[id][] (uma requisição a cada 50 leads), em paralelo
+                    additional_leads = await kommo_api.get_leads_by_ids_async(list(missing_lead_ids))
                     for lead in additional_leads:
                         if lead and lead.get('id'):
                             leads_map[lead['id']] = lead
-                    logger.info(f"Obtidos {len(additional_leads)} leads adicionais em paralelo")
+                    logger.info("Obtidos %d leads adicionais em paralelo", len(additional_leads))
                 except Exception as e:
-                    logger.error(f"Erro ao buscar leads adicionais em paralelo: {e}")
-                    # Fallback sequencial
-                    for lead_id in missing_lead_ids:
-                        try:
-                            additional_lead = kommo_api.get_lead(lead_id)
-                            if additional_lead:
-                                leads_map[lead_id] = additional_lead
-                        except:
-                            pass
-            
-            # Processar cada reunião e contar por corretor
-            for task in reunion_tasks:
-                if not task or task.get('entity_type') != 'leads':
-                    continue
-                
-                lead_id = task.get('entity_id')
-                lead = leads_map.get(lead_id)
-                
-                if not lead:
-                    continue
-                
-                # Extrair corretor do lead (mesma lógica dos leads)
-                custom_fields = lead.get("custom_fields_values", [])
-                corretor_lead = None
-                fonte_lead = None
-                produto_lead = None
-                
-                if custom_fields and isinstance(custom_fields, list):
-                    for field in custom_fields:
-                        if not field or not isinstance(field, dict):
-                            continue
-                        field_id = field.get("field_id")
-                        values = field.get("values", [])
-                        
-                        if field_id == CUSTOM_FIELD_CORRETOR and values:
-                            corretor_lead = values[0].get("value")
-                        elif field_id == CUSTOM_FIELD_FONTE and values:
-                            fonte_lead = values[0].get("value")
-                        elif field_id == CUSTOM_FIELD_PRODUTO and values:
-                            produto_lead = values[0].get("value")
-                
-                # Aplicar filtros APENAS se especificados (igual charts/leads-by-user)
-                if corretor and isinstance(corretor, str) and corretor.strip() and corretor_lead != corretor:
-                    continue
-                if fonte and isinstance(fonte, str) and fonte.strip() and fonte_lead != fonte:
-                    continue
-                if produto and isinstance(produto, str) and produto.strip() and produto_lead != produto:
-                    continue
+                    logger.error("Erro ao buscar leads adicionais em paralelo: %s", e)
                 
-                # Determinar corretor final (mesma lógica dos leads)
-                final_corretor = corretor_lead or users_map.get(lead.get("responsible_user_id"), "Usuário Sem Nome")
+                # IDs que o lote não trouxe (lote com falha): busca individual em threads, concorrência limitada
+                remaining_ids = missing_lead_ids - leads_map.keys()
+                if remaining_ids:
+                    found_leads = await _fetch_leads_by_id(remaining_ids)
+                    leads_map.update(found_leads)
+                    logger.info("Obtidos %d leads adicionais individualmente", len(found_leads))
                 
-                # Contar reunião para este corretor
-                meetings_by_corretor[final_corretor] = meetings_by_corretor.get(final_corretor, 0) + 1
+                # Contar as reuniões pendentes (só as tarefas cujo lead faltava, sem reler todas)
+                for lead_id in pending_lead_ids:
+                    lead = leads_map.get(lead_id)
+                    if lead:
+                        count_meeting(lead)
             
-            logger.info(f"Reuniões contadas por corretor: {meetings_by_corretor}")
+            # repr do dicionário inteiro apenas em DEBUG
+            logger.debug("Reuniões contadas por corretor: %s", meetings_by_corretor)
         
         # Processar dados por corretor usando custom field
         leads_by_user = []
@@ -663,225 +877,98 @@ async def get_sales_dashboard_complete(
             # Se filtrou por corretor específico, mostrar apenas esse corretor
             if corretor:
                 # Calcular métricas REAIS para o corretor específico
-                active_leads = len([lead for lead in all_leads if lead and lead.get("status_id") not in [142, 143]])
-                won_leads = len([lead for lead in all_leads if lead and lead.get("status_id") == 142])
-                lost_leads = len([lead for lead in all_leads if lead and lead.get("status_id") == 143])
-                
                 # Usar dados REAIS de reuniões
                 real_meetings = meetings_by_corretor.get(corretor, 0)
                 
                 leads_by_user = [{
                     "name": corretor,
                     "value": total_leads,
-                    "active": active_leads,
-                    "lost": lost_leads,
+                    "active": active_leads_count,
+                    "lost": lost_leads_count,
                     "meetings": real_meetings,  # DADOS REAIS
                     "meetingsHeld": real_meetings,  # DADOS REAIS
-                    "sales": won_leads
+                    "sales": won_leads_count
                 }]
             else:
-                # Agrupar por corretor usando custom field
-                corretor_counts = {}
-                
-                for lead in all_leads:
-                    if not lead:  # Proteção adicional
-                        continue
-                    corretor_name = None
-                    custom_fields = lead.get("custom_fields_values", [])
-                    
-                    # Buscar campo corretor
-                    if custom_fields and isinstance(custom_fields, list):
-                        for field in custom_fields:
-                            if field and field.get("field_id") == 837920:  # ID do campo Corretor
-                                values = field.get("values", [])
-                                if values and len(values) > 0:
-                                    corretor_name = values[0].get("value")
-                                    break
-                    
-                    if not corretor_name:
-                        corretor_name = "Sem corretor"
-                    
-                    if corretor_name not in corretor_counts:
-                        corretor_counts[corretor_name] = {
-                            "total": 0,
-                            "active": 0,
-                            "lost": 0,
-                            "won": 0
-                        }
-                    
-                    corretor_counts[corretor_name]["total"] += 1
-                    
-                    # Verificar status do lead
-                    status_id = lead.get("status_id")
-                    if status_id == 142:  # Won
-                        corretor_counts[corretor_name]["won"] += 1
-                    elif status_id == 143:  # Lost
-                        corretor_counts[corretor_name]["lost"] += 1
-                    else:  # Active
-                        corretor_counts[corretor_name]["active"] += 1
-                
-                # Criar array de dados por corretor com DADOS REAIS
-                for corretor_name, counts in corretor_counts.items():
-                    # Usar dados REAIS de reuniões do mapa meetings_by_corretor
-                    real_meetings = meetings_by_corretor.get(corretor_name, 0)
-                    
-                    leads_by_user.append({
-                        "name": corretor_name,
-                        "value": counts["total"],
-                        "active": counts["active"],
-                        "lost": counts["lost"],
-                        "meetings": real_meetings,  # DADOS REAIS
-                        "meetingsHeld": real_meetings,  # DADOS REAIS
-                        "sales": counts["won"]
-                    })
+                # Agrupar por corretor usando custom field (contado na passada única)
+                leads_by_user = _build_leads_by_user(aggregates["corretor_counts"], meetings_by_corretor)
         
         # Processar leads por estágio usando pipelines
         leads_by_stage_array = []
         
         try:
-            logger.info("Iniciando processamento de pipelines...")
-            # Buscar dados de pipelines para mapear status
-            pipelines_data = safe_get_data(kommo_api.get_pipelines)
-            logger.info(f"Pipelines data: {type(pipelines_data)}")
-            stage_map = {}
-            
-            if pipelines_data and "_embedded" in pipelines_data:
-                pipelines = pipelines_data["_embedded"].get("pipelines", [])
-                logger.info(f"Pipelines count: {len(pipelines) if isinstance(pipelines, list) else 'N/A'}")
-                if pipelines and isinstance(pipelines, list):
-                    for i, pipeline in enumerate(pipelines):
-                        logger.info(f"Processing pipeline {i}: {type(pipeline)}")
-                        if not pipeline or not isinstance(pipeline, dict):
-                            continue
-                        embedded_statuses = pipeline.get("_embedded", {})
-                        if embedded_statuses and isinstance(embedded_statuses, dict):
-                            statuses = embedded_statuses.get("statuses")
-                            if statuses and isinstance(statuses, list):
-                                for j, status in enumerate(statuses):
-                                    logger.info(f"Processing status {j}: {type(status)}")
-                                    if (status and isinstance(status, dict) and 
-                                        status.get("id") and status.get("name")):
-                                        stage_map[status["id"]] = status["name"]
+            # Buscar dados de pipelines para mapear status (cache em processo; mudam raramente)
+            pipelines_data = await _cached_reference("kommo:pipelines", 600, kommo_api.get_pipelines)
+            stage_map = _build_stage_map(pipelines_data)
             
-            logger.info(f"Stage map criado: {len(stage_map)} stages")
+            logger.debug("Stage map: %d stages", len(stage_map))
             
             # Contar leads por estágio
             if all_leads and stage_map:
-                logger.info("Contando leads por estágio...")
-                stage_counts = {}
-                for i, lead in enumerate(all_leads):
-                    if i % 50 == 0:  # Log a cada 50 leads
-                        logger.info(f"Processando lead {i}/{len(all_leads)}")
-                    if not lead or not isinstance(lead, dict):
-                        continue
-                    status_id = lead.get("status_id")
+                stage_counts = Counter()
+                # Contagem por status_id já feita na passada única; somar por nome do estágio
+                for status_id, count in status_counts.items():
                     if status_id and status_id in stage_map:
-                        stage_name = stage_map[status_id]
-                        stage_counts[stage_name] = stage_counts.get(stage_name, 0) + 1
+                        stage_counts[stage_map[status_id]] += count
                 
-                # Ordenar por quantidade com proteção
-                if stage_counts:
-                    sorted_stages = sorted(stage_counts.items(), key=lambda x: x[1], reverse=True)
-                    leads_by_stage_array = [
-                        {"name": name, "value": count}
-                        for name, count in sorted_stages
-                    ]
-                else:
-                    leads_by_stage_array = []
+                # Ordenar por quantidade (most_common já retorna em ordem decrescente)
+                leads_by_stage_array = [
+                    {"name": name, "value": count}
+                    for name, count in stage_counts.most_common()
+                ]
                 
-                logger.info(f"Leads por estágio: {len(leads_by_stage_array)} estágios encontrados")
+                logger.info("Leads por estágio: %d leads em %d estágios", total_leads, len(leads_by_stage_array))
         except Exception as stage_error:
-            logger.error(f"Erro no processamento de stages: {stage_error}")
+            logger.error("Erro no processamento de stages: %s", stage_error)
             import traceback
-            logger.error(f"Traceback stages: {traceback.format_exc()}")
+            logger.error("Traceback stages: %s", traceback.format_exc())
             leads_by_stage_array = []
         
         # Processar leads por fonte usando custom field "Fonte" (ID: 837886) para vendas também
         leads_by_source_sales = []
         
         if all_leads:
-            source_counts = {}
-            
-            for lead in all_leads:
-                if not lead:  # Proteção adicional
-                    continue
-                    
-                fonte_name = None
-                custom_fields = lead.get("custom_fields_values", [])
-                
-                # Buscar custom field "Fonte" (ID: 837886)
-                if custom_fields and isinstance(custom_fields, list):
-                    for field in custom_fields:
-                        if field and field.get("field_id") == 837886:  # ID do campo Fonte
-                            values = field.get("values", [])
-                            if values and len(values) > 0 and values[0]:
-                                fonte_name = values[0].get("value")
-                                if fonte_name:  # Verificar se não é None ou string vazia
-                                    break
-                
-                if not fonte_name:
-                    fonte_name = "Fonte Desconhecida"
-                
-                source_counts[fonte_name] = source_counts.get(fonte_name, 0) + 1
+            source_counts = aggregates["source_counts"]
             
             # Ordenar por quantidade
-            if source_counts:
-                sorted_sources = sorted(source_counts.items(), key=lambda x: x[1], reverse=True)
-                leads_by_source_sales = [
-                    {"name": name, "value": count}
-                    for name, count in sorted_sources
-                ]
+            leads_by_source_sales = [
+                {"name": name, "value": count}
+                for name, count in source_counts.most_common()
+            ]
         
         # Calcular métricas de performance baseadas nos dados reais filtrados
+        # (valores padrão se não houver leads)
+        conversion_rate_sales = 0
+        conversion_rate_meetings = 0
+        conversion_rate_prospects = 0
+        win_rate = 0
+        average_deal_size = 0
+        lead_cycle_time = 0
+        
         if all_leads:
-            # Calcular métricas reais com base nos leads filtrados
-            active_leads_count = len([lead for lead in all_leads if lead and lead.get("status_id") not in [142, 143]])
-            won_leads_count = len([lead for lead in all_leads if lead and lead.get("status_id") == 142])
-            lost_leads_count = len([lead for lead in all_leads if lead and lead.get("status_id") == 143])
-            
-            # Calcular taxas de conversão REAIS (sem estimativas)
-            conversion_rate_sales = (won_leads_count / total_leads * 100) if total_leads > 0 else 0
+            # Calcular taxas de conversão REAIS (sem estimativas); total_leads > 0 aqui
+            conversion_rate_sales = won_leads_count / total_leads * 100
             
             # Taxa de reuniões REAL: total de reuniões realizadas / total de leads
             total_meetings_held = sum(meetings_by_corretor.values())
-            conversion_rate_meetings = (total_meetings_held / total_leads * 100) if total_leads > 0 else 0
+            conversion_rate_meetings = total_meetings_held / total_leads * 100
             
             # Taxa de prospects: considerando leads ativos como prospects
-            conversion_rate_prospects = (active_leads_count / total_leads * 100) if total_leads > 0 else 0
+            conversion_rate_prospects = active_leads_count / total_leads * 100
             
             # Calcular win rate (vendas vs perdas)
             total_closed = won_leads_count + lost_leads_count
-            win_rate = (won_leads_count / total_closed * 100) if total_closed > 0 else 0
+            if total_closed:
+                win_rate = won_leads_count / total_closed * 100
             
             # Calcular ticket médio baseado nos leads ganhos
-            total_revenue = sum(lead.get("price", 0) or 0 for lead in all_leads if lead and lead.get("status_id") == 142)
-            average_deal_size = (total_revenue / won_leads_count) if won_leads_count > 0 else 0
+            if won_leads_count:
+                average_deal_size = aggregates["total_revenue"] / won_leads_count
             
             # Calcular tempo médio de ciclo
-            cycle_times = []
-            for lead in all_leads:
-                if (lead and lead.get("status_id") == 142 and 
-                    lead.get("closed_at") and lead.get("created_at") and
-                    isinstance(lead.get("closed_at"), (int, float)) and 
-                    isinstance(lead.get("created_at"), (int, float))):
-                    
-                    cycle_time = (lead.get("closed_at") - lead.get("created_at")) / (24 * 60 * 60)
-                    if cycle_time > 0:
-                        cycle_times.append(cycle_time)
-            
-            lead_cycle_time = sum(cycle_times) / len(cycle_times) if cycle_times else 0
-            
-        else:
-            # Valores padrão se não houver leads
-            conversion_rate_sales = 0
-            conversion_rate_meetings = 0  
-            conversion_rate_prospects = 0
-            win_rate = 0
-            average_deal_size = 0
-            lead_cycle_time = 0
-            active_leads_count = 0
-            lost_leads_count = 0
-            won_leads_count = 0
+            cycle_time_count = aggregates["cycle_time_count"]
+            if cycle_time_count:
+                lead_cycle_time = aggregates["cycle_time_sum"] / cycle_time_count
         
         # Métricas baseadas nos dados reais (não mais fixas)
         response = {
@@ -901,20 +988,14 @@ async def get_sales_dashboard_complete(
             "salesTrend": [],
             "customFields": {  # NOVO: Custom fields implementados
                 "fonte": leads_by_source_sales,
-                "available_fontes": [
-                    "Tráfego Meta", "Escritório Patacho", "Canal Pro", "Site", 
-                    "Redes Sociais", "Parceria com Construtoras", "Ação de Panfletagem",
-                    "Eletromídia", "Orgânico", "LandingPage", "Chamada", "Anúncio Físico",
-                    "Não atribuído", "Google", "Cliente", "Grupo Zap", "Celular do Plantão",
-                    "Tráfego Séculos"
-                ]
+                "available_fontes": AVAILABLE_FONTES
             },
             "analyticsOverview": {
                 "leads": {
                     "total": total_leads,
                     "active": active_leads_count,
                     "lost": lost_leads_count,
-                    "won": won_leads_count if all_leads else 0
+                    "won": won_leads_count
                 }
             },
             "analyticsFunnel": {},
@@ -925,7 +1006,7 @@ async def get_sales_dashboard_complete(
             "_metadata": {
                 "period_days": days,
                 "corretor_filter": corretor,
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": _iso_now(int(time.time())),
                 "data_sources": ["kommo_api"],
                 "optimized": True,
                 "single_request": True,
@@ -936,8 +1017,9 @@ async def get_sales_dashboard_complete(
             }
         }
         
-        logger.info(f"Dashboard vendas completo gerado: {len(response['leadsByUser'])} usuários, {len(response['leadsByStage'])} estágios")
-        return response
+        logger.info("Dashboard vendas completo gerado: %d usuários, %d estágios",
+                    len(response['leadsByUser']), len(response['leadsByStage']))
+        return ORJSONResponse(response)
         
     except HTTPException:
         # Re-raise HTTPExceptions (como 400 Bad Request) sem modificar
@@ -945,8 +1027,8 @@ async def get_sales_dashboard_complete(
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        logger.error(f"Erro ao gerar dashboard vendas completo: {str(e)}")
-        logger.error(f"Traceback completo: {error_details}")
+        logger.error("Erro ao gerar dashboard vendas completo: %s", e)
+        logger.error("Traceback completo: %s", error_details)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)} | Linha: {error_details.split('File')[1].split(',')[1] if 'File' in error_details else 'unknown'}")
 
 
@@ -959,7 +1041,7 @@ async def get_sales_dashboard_complete(
 #     - Usa created_at ou updated_at do lead
 
 
-@router.get("/detailed-tables")
+@router.get("/detailed-tables", response_class=ORJSONResponse)
 async def get_detailed_tables(
     corretor: Optional[str] = Query(None, description="Nome do corretor para filtrar dados"),
     fonte: Optional[str] = Query(None, description="Fonte para filtrar dados"),
@@ -978,7 +1060,7 @@ async def get_detailed_tables(
     Retorna TODOS os dados sem filtro de período.
     """
     try:
-        logger.info(f"Iniciando busca de tabelas detalhadas para TODOS os dados, corretor: {corretor}, fonte: {fonte}")
+        logger.info("Iniciando busca de tabelas detalhadas para TODOS os dados, corretor: %s, fonte: %s", corretor, fonte)
         
         # Status IDs corretos baseados na pipeline real
         STATUS_CONTRATO_ASSINADO = 80689759  # "Contrato Assinado"
@@ -994,31 +1076,15 @@ async def get_detailed_tables(
         CUSTOM_FIELD_PRODUTO = 857264  # Campo "Produto"
         CUSTOM_FIELD_PROPOSTA = 861100  # Campo "Proposta" (boolean)
         CUSTOM_FIELD_DATA_PROPOSTA = 882618  # Campo "Data da Proposta"
-        
-        # Função auxiliar para extrair valores de custom fields
-        def get_custom_field_value(lead, field_id):
-            """Extrai valor de um custom field específico"""
-            try:
-                custom_fields = lead.get("custom_fields_values", [])
-                if not custom_fields:
-                    return None
-                for field in custom_fields:
-                    if not field:
-                        continue
-                    if field.get("field_id") == field_id:
-                        values = field.get("values")
-                        if values and isinstance(values, list) and len(values) > 0:
-                            first_value = values[0]
-                            if isinstance(first_value, dict):
-                                return first_value.get("value")
-                            elif isinstance(first_value, str):
-                                return first_value
-                return None
-            except Exception as e:
-                logger.error(f"Erro ao extrair custom field {field_id}: {e}")
-                return None
-
-        def is_proposta(lead):
+        # Campos customizados exibidos nas tabelas (extraídos em uma única passada por lead)
+        DETAIL_FIELD_IDS = frozenset({
+            CUSTOM_FIELD_DATA_PROPOSTA, CUSTOM_FIELD_FONTE, CUSTOM_FIELD_CORRETOR,
+            CUSTOM_FIELD_ANUNCIO, CUSTOM_FIELD_PUBLICO, CUSTOM_FIELD_PRODUTO,
+        })
+        SALE_FIELD_IDS = DETAIL_FIELD_IDS | {CUSTOM_FIELD_DATA_FECHAMENTO}
+        SALE_STATUS_IDS = frozenset({STATUS_VENDA_FINAL, STATUS_CONTRATO_ASSINADO})  # Closed-won, Contrato Assinado
+
+        def is_proposta(lead, data_proposta):
             """Verifica se um lead é uma proposta: tem data_proposta E price > 0"""
             try:
                 # Verificar se tem valor monetário (price > 0)
@@ -1027,26 +1093,22 @@ async def get_detailed_tables(
                     return False
 
                 # Verificar se tem data_proposta preenchida
-                data_proposta = get_custom_field_value(lead, CUSTOM_FIELD_DATA_PROPOSTA)
                 if not data_proposta:
                     return False
 
                 return True
             except Exception as e:
-                logger.error(f"Erro ao verificar se lead é proposta: {e}")
+                logger.error("Erro ao verificar se lead é proposta: %s", e)
                 return False
 
-        def validate_proposta_in_period(lead, start_timestamp, end_timestamp):
-            """Valida se a proposta deve ser incluída baseado na Data da Proposta e valor"""
+        def validate_proposta_in_period(lead, start_timestamp, end_timestamp, data_proposta_timestamp):
+            """Valida se a proposta deve ser incluída baseado na Data da Proposta (já extraída) e valor"""
             try:
                 # Verificar se tem valor monetário (price > 0)
                 price = lead.get("price", 0) or 0
                 if price <= 0:
                     return False  # Sem valor = não é proposta
 
-                # Extrair data da proposta
-                data_proposta_timestamp = get_custom_field_value(lead, CUSTOM_FIELD_DATA_PROPOSTA)
-
                 if not data_proposta_timestamp:
                     return False  # Sem data_proposta = não é proposta
 
@@ -1067,47 +1129,46 @@ async def get_detailed_tables(
                 return start_timestamp <= data_proposta_timestamp <= end_timestamp
 
             except Exception as e:
-                logger.error(f"Erro ao validar proposta no período: {e}")
+                logger.error("Erro ao validar proposta no período: %s", e)
                 return False
         
         # ABORDAGEM SIMPLIFICADA: Buscar TODOS os leads sem filtro
         # Calcular filtros de data
-        import time
-        
         if start_date and end_date:
             # Usar datas específicas
             try:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-                start_timestamp = int(start_dt.timestamp())
-                end_timestamp = int(end_dt.timestamp())
+                start_timestamp, end_timestamp = resolve_time_window(days, start_date, end_date)
+                start_dt = datetime.fromtimestamp(start_timestamp)
+                end_dt = datetime.fromtimestamp(end_timestamp)
                 
                 # Para reuniões: incluir 23:59 do dia anterior para capturar reuniões agendadas na virada do dia
                 meetings_start_dt = start_dt - timedelta(days=1)
                 meetings_start_dt = meetings_start_dt.replace(hour=23, minute=59, second=0)
                 meetings_start_timestamp = int(meetings_start_dt.timestamp())
                 
-                logger.info(f"Filtro por período: {start_date} a {end_date}")
-                logger.info(f"Filtro reuniões: {meetings_start_dt.strftime('%Y-%m-%d %H:%M')} a {end_dt.strftime('%Y-%m-%d %H:%M')}")
+                logger.info("Filtro por período: %s a %s", start_date, end_date)
+                logger.info("Filtro reuniões: %s a %s", meetings_start_dt.strftime('%Y-%m-%d %H:%M'), end_dt.strftime('%Y-%m-%d %H:%M'))
             except ValueError as date_error:
-                logger.error(f"Erro de validação de data: {date_error}")
+                logger.error("Erro de validação de data: %s", date_error)
                 raise HTTPException(status_code=400, detail="Formato de data inválido. Use YYYY-MM-DD")
         else:
             # Usar período em dias
-            end_timestamp = int(time.time())
-            start_timestamp = end_timestamp - (days * 24 * 60 * 60)
+            start_timestamp, end_timestamp = resolve_time_window(days, None, None)
             start_dt = datetime.fromtimestamp(start_timestamp, tz=BRAZIL_TIMEZONE)
             end_dt = datetime.fromtimestamp(end_timestamp, tz=BRAZIL_TIMEZONE)
             
             # Para reuniões: incluir 23:59 do dia anterior
-            meetings_start_timestamp = start_timestamp - (24 * 60 * 60) + (23 * 60 * 60 + 59 * 60)  # -1 dia + 23:59
+            meetings_start_timestamp = start_timestamp - SECONDS_PER_DAY + (23 * 60 * 60 + 59 * 60)  # -1 dia + 23:59
             meetings_start_dt = datetime.fromtimestamp(meetings_start_timestamp, tz=BRAZIL_TIMEZONE)
             
-            logger.info(f"Filtro por {days} dias: {start_dt.strftime('%Y-%m-%d')} a {end_dt.strftime('%Y-%m-%d')}")
-            logger.info(f"Filtro reuniões: {meetings_start_dt.strftime('%Y-%m-%d %H:%M')} a {end_dt.strftime('%Y-%m-%d %H:%M')}")
+            logger.info("Filtro por %s dias: %s a %s", days, start_dt.strftime('%Y-%m-%d'), end_dt.strftime('%Y-%m-%d'))
+            logger.info("Filtro reuniões: %s a %s", meetings_start_dt.strftime('%Y-%m-%d %H:%M'), end_dt.strftime('%Y-%m-%d %H:%M'))
+        
+        # Filtros de corretor/fonte (suportam múltiplos valores separados por vírgula), calculados uma vez
+        corretor_filter = _parse_filter_values(corretor)
+        fonte_filter = _parse_filter_values(fonte)
         
-        logger.info(f"Buscando leads do Funil de Vendas (pipeline {PIPELINE_VENDAS})")
+        logger.info("Buscando leads do Funil de Vendas (pipeline %s)", PIPELINE_VENDAS)
         
         # IDs dos pipelines necessários
         PIPELINE_REMARKETING = 11059911  # ID do Remarketing
@@ -1142,14 +1203,12 @@ async def get_detailed_tables(
         
         
         # ================================================================
-        # OTIMIZAÇÃO v3: Buscar dados em paralelo com ThreadPoolExecutor + asyncio para propostas
-        # ThreadPoolExecutor para dados iniciais (mais estável)
+        # OTIMIZAÇÃO v3: Buscar dados em paralelo com asyncio.gather + asyncio.to_thread
+        # Cliente síncrono em threads para dados iniciais; users/pipelines via cache de referência
         # aiohttp para propostas (já otimizado)
         # ================================================================
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        import time as time_module
 
-        parallel_start = time_module.time()
+        parallel_start = time.time()
         logger.info("Iniciando busca PARALELA de dados...")
 
         # Preparar parâmetros para leads
@@ -1173,6 +1232,7 @@ async def get_detailed_tables(
         tasks_params = {
             'filter[task_type_id]': 2,
             'filter[is_completed]': 1,
+            'filter[entity_type]': 'leads',  # Apenas tarefas vinculadas a leads
             'filter[complete_till][from]': meetings_start_timestamp,
             'filter[complete_till][to]': end_timestamp,
             'limit': limit
@@ -1184,7 +1244,7 @@ async def get_detailed_tables(
                 result = kommo_api.get_all_leads_old(vendas_vendas_params)
                 return ("vendas_vendas", result or [])
             except Exception as e:
-                logger.error(f"Erro ao buscar vendas vendas: {e}")
+                logger.error("Erro ao buscar vendas vendas: %s", e)
                 return ("vendas_vendas", [])
 
         def fetch_vendas_remarketing():
@@ -1192,31 +1252,15 @@ async def get_detailed_tables(
                 result = kommo_api.get_all_leads_old(vendas_remarketing_params)
                 return ("vendas_remarketing", result or [])
             except Exception as e:
-                logger.error(f"Erro ao buscar vendas remarketing: {e}")
+                logger.error("Erro ao buscar vendas remarketing: %s", e)
                 return ("vendas_remarketing", [])
 
-        def fetch_users():
-            try:
-                result = safe_get_data(kommo_api.get_users)
-                return ("users", result)
-            except Exception as e:
-                logger.error(f"Erro ao buscar users: {e}")
-                return ("users", {})
-
-        def fetch_pipelines():
-            try:
-                result = safe_get_data(kommo_api.get_pipelines)
-                return ("pipelines", result)
-            except Exception as e:
-                logger.error(f"Erro ao buscar pipelines: {e}")
-                return ("pipelines", {})
-
         def fetch_leads_vendas():
             try:
                 result = kommo_api.get_all_leads_old(all_leads_params)
                 return ("leads_vendas", result or [])
             except Exception as e:
-                logger.error(f"Erro ao buscar leads vendas: {e}")
+                logger.error("Erro ao buscar leads vendas: %s", e)
                 return ("leads_vendas", [])
 
         def fetch_leads_remarketing():
@@ -1224,7 +1268,7 @@ async def get_detailed_tables(
                 result = kommo_api.get_all_leads_old(all_leads_remarketing_params)
                 return ("leads_remarketing", result or [])
             except Exception as e:
-                logger.error(f"Erro ao buscar leads remarketing: {e}")
+                logger.error("Erro ao buscar leads remarketing: %s", e)
                 return ("leads_remarketing", [])
 
         def fetch_tasks():
@@ -1232,33 +1276,36 @@ async def get_detailed_tables(
                 result = kommo_api.get_all_tasks(tasks_params)
                 return ("tasks", result or [])
             except Exception as e:
-                logger.error(f"Erro ao buscar tasks: {e}")
+                logger.error("Erro ao buscar tasks: %s", e)
                 return ("tasks", [])
 
-        # Executar TODAS as 7 chamadas em paralelo
-        # max_workers=5 para ficar abaixo do limite de 7 req/s da Kommo
+        # Executar TODAS as 7 chamadas em paralelo sem bloquear o event loop
+        # (o rate limiter do KommoAPI mantém o limite de 7 req/s da Kommo)
         parallel_results = {}
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(fetch_vendas_vendas),
-                executor.submit(fetch_vendas_remarketing),
-                executor.submit(fetch_users),
-                executor.submit(fetch_pipelines),
-                executor.submit(fetch_leads_vendas),
-                executor.submit(fetch_leads_remarketing),
-                executor.submit(fetch_tasks),
-            ]
-
-            for future in as_completed(futures):
-                try:
-                    key, value = future.result(timeout=120)
-                    parallel_results[key] = value
-                    logger.info(f"Busca paralela concluída: {key}")
-                except Exception as e:
-                    logger.error(f"Erro em busca paralela: {e}")
+        results = await asyncio.gather(
+            asyncio.to_thread(fetch_vendas_vendas),
+            asyncio.to_thread(fetch_vendas_remarketing),
+            asyncio.to_thread(fetch_leads_vendas),
+            asyncio.to_thread(fetch_leads_remarketing),
+            asyncio.to_thread(fetch_tasks),
+            _cached_reference("kommo:users", 300, kommo_api.get_users),
+            _cached_reference("kommo:pipelines", 600, kommo_api.get_pipelines),
+            return_exceptions=True
+        )
+        for key, result in zip(
+            ("vendas_vendas", "vendas_remarketing", "leads_vendas", "leads_remarketing", "tasks", "users", "pipelines"),
+            results
+        ):
+            if isinstance(result, Exception):
+                logger.error("Erro em busca paralela (%s): %s", key, result)
+                continue
+            if isinstance(result, tuple):  # Wrappers fetch_* retornam (chave, valor)
+                result = result[1]
+            parallel_results[key] = result
+            logger.debug("Busca paralela concluída: %s", key)
 
-        parallel_elapsed = time_module.time() - parallel_start
-        logger.info(f"Busca PARALELA concluída em {parallel_elapsed:.2f}s")
+        parallel_elapsed = time.time() - parallel_start
+        logger.info("Busca PARALELA concluída em %.2fs", parallel_elapsed)
 
         # Extrair resultados
         vendas_vendas_all = parallel_results.get("vendas_vendas", [])
@@ -1276,17 +1323,12 @@ async def get_detailed_tables(
         all_leads_remarketing_data = {"_embedded": {"leads": all_leads_remarketing_all}}
         tasks_data = {"_embedded": {"tasks": all_tasks}}
 
-        logger.info(f"Vendas Vendas: {len(vendas_vendas_all)}")
-        logger.info(f"Vendas Remarketing: {len(vendas_remarketing_all)}")
-        logger.info(f"Leads Vendas: {len(all_leads_vendas_all)}")
-        logger.info(f"Leads Remarketing: {len(all_leads_remarketing_all)}")
-        logger.info(f"Tasks: {len(all_tasks)}")
+        logger.info("Vendas: %s (Vendas) + %s (Remarketing); Leads: %s (Vendas) + %s (Remarketing); Tasks: %s",
+                    len(vendas_vendas_all), len(vendas_remarketing_all),
+                    len(all_leads_vendas_all), len(all_leads_remarketing_all), len(all_tasks))
 
         # Criar mapa de usuários
-        users_map = {}
-        if users_data and "_embedded" in users_data:
-            for user in users_data["_embedded"].get("users", []):
-                users_map[user["id"]] = user["name"]
+        users_map = _build_name_map(users_data, "users")
 
         # Criar mapa de status IDs para nomes reais
         status_map = {}
@@ -1310,7 +1352,7 @@ async def get_detailed_tables(
                         # Se o pipeline não tinha status embedados, buscar explicitamente
                         if pipeline_id and not embedded_statuses.get("statuses"):
                             try:
-                                statuses_response = kommo_api.get_pipeline_statuses(pipeline_id)
+                                statuses_response = await asyncio.to_thread(kommo_api.get_pipeline_statuses, pipeline_id)
                                 if statuses_response and "_embedded" in statuses_response:
                                     for status in statuses_response["_embedded"].get("statuses", []):
                                         if status and isinstance(status, dict):
@@ -1319,37 +1361,37 @@ async def get_detailed_tables(
                                             if status_id:
                                                 status_map[status_id] = status_name
                             except Exception as e:
-                                logger.warning(f"Erro ao buscar status do pipeline {pipeline_id}: {e}")
+                                logger.warning("Erro ao buscar status do pipeline %s: %s", pipeline_id, e)
 
-        logger.info(f"Status map construído com {len(status_map)} status")
+        logger.info("Status map construído com %s status", len(status_map))
 
         # Combinar VENDAS de ambos os pipelines
         all_vendas = []
         if vendas_vendas_data and "_embedded" in vendas_vendas_data:
             vendas = vendas_vendas_data["_embedded"].get("leads", [])
             all_vendas.extend(vendas)
-            logger.info(f"Vendas do Funil de Vendas: {len(vendas)}")
+            logger.info("Vendas do Funil de Vendas: %s", len(vendas))
 
         if vendas_remarketing_data and "_embedded" in vendas_remarketing_data:
             vendas = vendas_remarketing_data["_embedded"].get("leads", [])
             all_vendas.extend(vendas)
-            logger.info(f"Vendas do Remarketing: {len(vendas)}")
+            logger.info("Vendas do Remarketing: %s", len(vendas))
 
-        logger.info(f"Encontradas {len(all_vendas)} vendas totais")
+        logger.info("Encontradas %s vendas totais", len(all_vendas))
 
         # Combinar TODOS os leads
         all_leads_for_details = []
         if all_leads_vendas_data and "_embedded" in all_leads_vendas_data:
             leads = all_leads_vendas_data["_embedded"].get("leads", [])
             all_leads_for_details.extend(leads)
-            logger.info(f"Todos os leads do Funil de Vendas: {len(leads)}")
+            logger.info("Todos os leads do Funil de Vendas: %s", len(leads))
 
         if all_leads_remarketing_data and "_embedded" in all_leads_remarketing_data:
             leads = all_leads_remarketing_data["_embedded"].get("leads", [])
             all_leads_for_details.extend(leads)
-            logger.info(f"Todos os leads do Remarketing: {len(leads)}")
+            logger.info("Todos os leads do Remarketing: %s", len(leads))
 
-        logger.info(f"Total de leads para leadsDetalhes: {len(all_leads_for_details)}")
+        logger.info("Total de leads para leadsDetalhes: %s", len(all_leads_for_details))
         
         # Listas para as tabelas
         reunioes_detalhes = []  # Reuniões não-orgânicas
@@ -1364,16 +1406,16 @@ async def get_detailed_tables(
         reunioes_tasks = []
         if tasks_data and '_embedded' in tasks_data:
             reunioes_tasks = tasks_data.get('_embedded', {}).get('tasks', [])
-            logger.info(f"Encontradas {len(reunioes_tasks)} tarefas de reunião concluídas")
+            logger.info("Encontradas %s tarefas de reunião concluídas", len(reunioes_tasks))
             
         
         # Criar mapa de lead_id para lead (usar todos os leads para lookup de reuniões)
-        all_leads_combined = all_vendas + all_leads_for_details
-        # Remover duplicatas usando um dicionário
-        leads_map = {}
-        for lead in all_leads_combined:
-            if lead and lead.get("id"):
-                leads_map[lead.get("id")] = lead
+        # Remover duplicatas usando um dicionário (chain evita materializar a lista concatenada)
+        leads_map = {
+            lead["id"]: lead
+            for lead in chain(all_vendas, all_leads_for_details)
+            if lead and lead.get("id")
+        }
         
         # OTIMIZAÇÃO INTELIGENTE: Buscar apenas leads únicos das reuniões
         # Coletar IDs únicos dos leads das reuniões que não estão no mapa
@@ -1384,81 +1426,49 @@ async def get_detailed_tables(
                 if lead_id and lead_id not in leads_map:
                     reunion_lead_ids.add(lead_id)
         
-        print(f"DEBUG: {len(reunioes_tasks)} reuniões encontradas")
-        print(f"DEBUG: {len(reunion_lead_ids)} leads únicos precisam ser buscados")
+        logger.debug("%s reuniões encontradas", len(reunioes_tasks))
+        logger.debug("%s leads únicos precisam ser buscados", len(reunion_lead_ids))
         
         # Buscar os leads faltantes em lote usando filtro de IDs
         if reunion_lead_ids:
-            logger.info(f"Buscando {len(reunion_lead_ids)} leads adicionais para reuniões: {list(reunion_lead_ids)}")
+            logger.info("Buscando %s leads adicionais para reuniões", len(reunion_lead_ids))
+            logger.debug("IDs dos leads adicionais: %s", reunion_lead_ids)
             
-            # DEBUG: Tentar busca em lote primeiro, mas com fallback garantido
+            # Busca em lote primeiro; o que faltar é buscado individualmente logo abaixo
             leads_found_batch = 0
             try:
-                # Converter IDs para string separada por vírgula
-                ids_string = ','.join(str(id) for id in reunion_lead_ids)
-                print(f"DEBUG: Tentando busca em lote com IDs: {ids_string}")
-                
-                # Buscar múltiplos leads de uma vez
-                batch_params = {
-                    'filter[id]': ids_string,
-                    'limit': len(reunion_lead_ids),
-                    'with': 'contacts,custom_fields_values'
-                }
+                # Buscar múltiplos leads de uma vez: filter[id][] em lotes de 50 IDs, em paralelo
+                batch_leads = await kommo_api.get_leads_by_ids_async(list(reunion_lead_ids))
+                logger.debug("Leads encontrados em lote: %s", len(batch_leads))
                 
-                batch_result = kommo_api.get_leads(batch_params)
-                print(f"DEBUG: Resultado busca em lote: {batch_result is not None}")
-                
-                if batch_result and '_embedded' in batch_result:
-                    batch_leads = batch_result['_embedded'].get('leads', [])
-                    print(f"DEBUG: Leads encontrados em lote: {len(batch_leads)}")
-                    
-                    # Adicionar todos os leads encontrados ao mapa
-                    for lead in batch_leads:
-                        if lead and lead.get('id'):
-                            leads_map[lead.get('id')] = lead
-                            leads_found_batch += 1
-                            print(f"DEBUG: Lead {lead.get('id')} adicionado via lote")
+                # Adicionar todos os leads encontrados ao mapa
+                for lead in batch_leads:
+                    if lead and lead.get('id'):
+                        leads_map[lead.get('id')] = lead
+                        leads_found_batch += 1
                 
             except Exception as e:
-                print(f"DEBUG: Erro na busca em lote: {e}")
+                logger.warning("Erro na busca em lote: %s", e)
             
             # Busca paralela para IDs não encontrados (muito mais rápida)
             remaining_ids = reunion_lead_ids - set(leads_map.keys())
+            found_leads = {}
             if remaining_ids:
-                print(f"DEBUG: Fazendo busca PARALELA para {len(remaining_ids)} leads restantes")
-                
-                from concurrent.futures import ThreadPoolExecutor, as_completed
-                import time
-                
-                def fetch_lead(lead_id):
-                    try:
-                        return lead_id, kommo_api.get_lead(lead_id)
-                    except Exception as e:
-                        print(f"DEBUG: Erro ao buscar lead {lead_id}: {e}")
-                        return lead_id, None
+                logger.debug("Fazendo busca PARALELA para %s leads restantes", len(remaining_ids))
                 
                 start_time = time.time()
-                # OTIMIZAÇÃO: Máximo 10 threads para melhor performance sem sobrecarregar
-                max_threads = min(10, len(remaining_ids))
-                print(f"DEBUG: Usando {max_threads} threads paralelas")
-                with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                    # Submeter todas as tarefas
-                    future_to_id = {executor.submit(fetch_lead, lead_id): lead_id for lead_id in remaining_ids}
-                    
-                    # Coletar resultados conforme ficam prontos
-                    for future in as_completed(future_to_id):
-                        lead_id, lead = future.result()
-                        if lead:
-                            leads_map[lead_id] = lead
-                            print(f"DEBUG: Lead {lead_id} encontrado via thread")
+                # Máximo 10 requisições simultâneas; threads via asyncio sem bloquear o event loop
+                found_leads = await _fetch_leads_by_id(remaining_ids, concurrency=10)
+                leads_map.update(found_leads)
+                logger.debug("%s leads encontrados via busca paralela", len(found_leads))
                 
                 elapsed = time.time() - start_time
-                print(f"DEBUG: Busca paralela concluída em {elapsed:.2f}s para {len(remaining_ids)} leads")
+                logger.debug("Busca paralela concluída em %.2fs para %s leads", elapsed, len(remaining_ids))
             
-            logger.info(f"Total leads encontrados: {leads_found_batch} em lote + {len(reunion_lead_ids) - len(remaining_ids) - leads_found_batch} individual")
+            logger.info("Total leads encontrados: %s em lote + %s individual", leads_found_batch, len(found_leads))
         
         # Processar tarefas de reunião (agora com todos os leads disponíveis)
-        print(f"DEBUG: Processando {len(reunioes_tasks)} reuniões...")
+        logger.debug("Processando %s reuniões...", len(reunioes_tasks))
         for task in reunioes_tasks:
             if not task or task.get('entity_type') != 'leads':
                 continue
@@ -1492,31 +1502,15 @@ async def get_detailed_tables(
             if data_reuniao < start_timestamp or data_reuniao > end_timestamp:
                 continue
                 
-            # Extrair custom fields do lead
-            custom_fields = lead.get("custom_fields_values", [])
-            fonte_lead = "N/A"
-            corretor_custom = None
-            anuncio_lead = "N/A"  # Novo campo
-            publico_lead = "N/A"  # Novo campo (conjunto de anúncios)
-            produto_lead = "N/A"  # Campo Produto
-            data_proposta_lead = format_proposal_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)  # Campo Data da Proposta
-
-            if custom_fields and isinstance(custom_fields, list):
-                for field in custom_fields:
-                    if field and isinstance(field, dict):
-                        field_id = field.get("field_id")
-                        values = field.get("values", [])
-
-                        if field_id == 837886 and values:  # Fonte
-                            fonte_lead = values[0].get("value", "N/A")
-                        elif field_id == 837920 and values:  # Corretor
-                            corretor_custom = values[0].get("value")
-                        elif field_id == 837846 and values:  # Anúncio
-                            anuncio_lead = values[0].get("value", "N/A")
-                        elif field_id == 837844 and values:  # Público (conjunto de anúncios)
-                            publico_lead = values[0].get("value", "N/A")
-                        elif field_id == 857264 and values:  # Produto
-                            produto_lead = values[0].get("value", "N/A")
+            # Extrair custom fields do lead em uma única passada
+            fields = extract_custom_fields(lead, DETAIL_FIELD_IDS)
+            fonte_lead = fields.get(CUSTOM_FIELD_FONTE, "N/A")
+            corretor_custom = fields.get(CUSTOM_FIELD_CORRETOR)
+            anuncio_lead = fields.get(CUSTOM_FIELD_ANUNCIO, "N/A")  # Novo campo
+            publico_lead = fields.get(CUSTOM_FIELD_PUBLICO, "N/A")  # Novo campo (conjunto de anúncios)
+            produto_lead = fields.get(CUSTOM_FIELD_PRODUTO, "N/A")  # Campo Produto
+            # Campo Data da Proposta (já extraído; sem nova varredura dos custom fields)
+            data_proposta_lead = format_timestamp_brazil(parse_closure_date(fields.get(CUSTOM_FIELD_DATA_PROPOSTA)))
 
             # Determinar corretor final - apenas do custom field
             if corretor_custom:
@@ -1535,37 +1529,22 @@ async def get_detailed_tables(
             # Determinar etapa baseado no status_id usando nomes reais da API
             etapa = status_map.get(status_id, f"Status {status_id}")
             
-            # Filtrar por corretor se especificado
-            if corretor and isinstance(corretor, str) and corretor.strip():
-                if ',' in corretor:
-                    corretores_list = [c.strip() for c in corretor.split(',')]
-                    if corretor_final not in corretores_list:
-                        continue
-                else:
-                    if corretor_final != corretor:
-                        continue
+            # Filtrar por corretor se especificado (frozenset pré-calculado)
+            if corretor_filter is not None and corretor_final not in corretor_filter:
+                continue
                 
             # Filtrar por fonte se especificado - suporta múltiplos valores separados por vírgula
-            if fonte and isinstance(fonte, str) and fonte.strip():
-                if ',' in fonte:
-                    fontes_list = [f.strip() for f in fonte.split(',')]
-                    if fonte_lead not in fontes_list:
-                        continue
-                else:
-                    if fonte_lead != fonte:
-                        continue
-            
-            # Formatar data com a data real de conclusão
-            data_formatada = format_timestamp_brazil(data_reuniao)
+            if fonte_filter is not None and fonte_lead not in fonte_filter:
+                continue
             
-            # Adicionar informação sobre quando a reunião estava agendada originalmente
-            data_agendada = task.get('complete_till')
-            data_agendada_formatada = format_timestamp_brazil(data_agendada) if data_agendada else "N/A"
+            # Formatar data com a data real de conclusão; data_reuniao já é o complete_till
+            # (data do agendamento), então o mesmo texto serve para as duas colunas
+            data_formatada = _format_ts_brazil(data_reuniao)
             
             # Criar objeto da reunião
             reuniao_obj = {
                 "Data da Reunião": data_formatada,  # Data em que foi marcada como concluída
-                "Data Agendada": data_agendada_formatada,  # Data original do agendamento
+                "Data Agendada": data_formatada,  # Data original do agendamento
                 "Nome do Lead": lead_name,
                 "Corretor": corretor_final,
                 "Fonte": fonte_lead,
@@ -1586,6 +1565,7 @@ async def get_detailed_tables(
         
         
         # Processar VENDAS (filtrar por data_fechamento no período)
+        valor_total_vendas = 0.0  # Somado a partir do price bruto (arredondado como na coluna formatada)
         for lead in all_vendas:
             if not lead:
                 continue
@@ -1595,53 +1575,44 @@ async def get_detailed_tables(
             price = lead.get("price", 0)
             created_at = lead.get("created_at")
 
-            # Validar se a venda deve ser incluída (status + data no período)
-            if not validate_sale_in_period(lead, start_timestamp, end_timestamp, CUSTOM_FIELD_DATA_FECHAMENTO):
+            # Validar se a venda deve ser incluída (mesma regra de validate_sale_in_period:
+            # status de venda + data de fechamento no período), reaproveitando a extração abaixo
+            if lead.get("status_id") not in SALE_STATUS_IDS:
                 continue
 
-            # Extrair campos customizados usando função padronizada
-            fonte_lead = extract_custom_field_value(lead, 837886) or "N/A"  # Fonte
-            corretor_custom = extract_custom_field_value(lead, 837920)  # Corretor
-            anuncio_lead = extract_custom_field_value(lead, 837846) or "N/A"  # Anúncio
-            publico_lead = extract_custom_field_value(lead, 837844) or "N/A"  # Público (conjunto de anúncios)
-            produto_lead = extract_custom_field_value(lead, CUSTOM_FIELD_PRODUTO) or "N/A"  # Produto
-            data_proposta_lead = format_proposal_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)  # Campo Data da Proposta
+            # Extrair todos os campos customizados em uma única passada
+            fields = extract_custom_fields(lead, SALE_FIELD_IDS)
+
+            # Timestamp da data de fechamento (validação do período e formatação)
+            data_timestamp = parse_closure_date(fields.get(CUSTOM_FIELD_DATA_FECHAMENTO))
+            if not data_timestamp or not (start_timestamp <= data_timestamp <= end_timestamp):
+                continue
 
-            # Obter timestamp da data de fechamento para formatação
-            data_timestamp = get_lead_closure_date(lead, CUSTOM_FIELD_DATA_FECHAMENTO)
-            if not data_timestamp:
-                continue  # Não deveria chegar aqui, mas por segurança
+            fonte_lead = fields.get(CUSTOM_FIELD_FONTE) or "N/A"  # Fonte
+            corretor_custom = fields.get(CUSTOM_FIELD_CORRETOR)  # Corretor
+            anuncio_lead = fields.get(CUSTOM_FIELD_ANUNCIO) or "N/A"  # Anúncio
+            publico_lead = fields.get(CUSTOM_FIELD_PUBLICO) or "N/A"  # Público (conjunto de anúncios)
+            produto_lead = fields.get(CUSTOM_FIELD_PRODUTO) or "N/A"  # Produto
+            data_proposta_lead = format_timestamp_brazil(parse_closure_date(fields.get(CUSTOM_FIELD_DATA_PROPOSTA)))  # Campo Data da Proposta
 
             # Determinar corretor final
             corretor_final = corretor_custom or "Não atribuído"
             
-            # Filtrar por corretor se especificado
-            if corretor and isinstance(corretor, str) and corretor.strip():
-                if ',' in corretor:
-                    corretores_list = [c.strip() for c in corretor.split(',')]
-                    if corretor_final not in corretores_list:
-                        continue
-                else:
-                    if corretor_final != corretor:
-                        continue
+            # Filtrar por corretor se especificado (frozenset pré-calculado)
+            if corretor_filter is not None and corretor_final not in corretor_filter:
+                continue
                 
             # Filtrar por fonte se especificado
-            if fonte and isinstance(fonte, str) and fonte.strip():
-                if ',' in fonte:
-                    fontes_list = [f.strip() for f in fonte.split(',')]
-                    if fonte_lead not in fontes_list:
-                        continue
-                else:
-                    if fonte_lead != fonte:
-                        continue
+            if fonte_filter is not None and fonte_lead not in fonte_filter:
+                continue
             
             # Formatar data usando data_fechamento
-            data_formatada = format_timestamp_brazil(data_timestamp)
-            valor_formatado = f"R$ {price:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+            data_formatada = _format_ts_brazil(data_timestamp)
+            valor_formatado = _format_brl(price)
             
             # Formatar data de criação
             if created_at:
-                data_criacao_formatada = format_timestamp_brazil(created_at, "%Y-%m-%d")
+                data_criacao_formatada = _format_date_brazil(created_at)
             else:
                 data_criacao_formatada = "N/A"
             
@@ -1660,9 +1631,13 @@ async def get_detailed_tables(
             
             # Adicionar à lista de vendas
             vendas_detalhes.append(venda_dict)
+            valor_total_vendas += round(price, 2)
         
         # NOVO: Processar todos os leads para leadsDetalhes
         logger.info("Processando todos os leads para leadsDetalhes...")
+        # Contagem de propostas (campo boolean) feita durante o loop, sem re-varrer as listas
+        total_propostas_leads_boolean = 0
+        total_propostas_organicos_boolean = 0
         for lead in all_leads_for_details:
             if not lead:
                 continue
@@ -1672,31 +1647,15 @@ async def get_detailed_tables(
             status_id = lead.get("status_id")
             pipeline_id = lead.get("pipeline_id")
 
-            # Extrair custom fields
-            custom_fields = lead.get("custom_fields_values", [])
-            fonte_lead = "N/A"
-            corretor_custom = None
-            anuncio_lead = "N/A"  # Novo campo
-            publico_lead = "N/A"  # Novo campo (conjunto de anúncios)
-            produto_lead = "N/A"  # Campo Produto
-            data_proposta_lead = format_proposal_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)  # Campo Data da Proposta
-
-            if custom_fields and isinstance(custom_fields, list):
-                for field in custom_fields:
-                    if field and isinstance(field, dict):
-                        field_id = field.get("field_id")
-                        values = field.get("values", [])
-
-                        if field_id == 837886 and values:  # Fonte
-                            fonte_lead = values[0].get("value", "N/A")
-                        elif field_id == 837920 and values:  # Corretor
-                            corretor_custom = values[0].get("value")
-                        elif field_id == 837846 and values:  # Anúncio
-                            anuncio_lead = values[0].get("value", "N/A")
-                        elif field_id == 837844 and values:  # Público (conjunto de anúncios)
-                            publico_lead = values[0].get("value", "N/A")
-                        elif field_id == 857264 and values:  # Produto
-                            produto_lead = values[0].get("value", "N/A")
+            # Extrair custom fields em uma única passada
+            fields = extract_custom_fields(lead, DETAIL_FIELD_IDS)
+            fonte_lead = fields.get(CUSTOM_FIELD_FONTE, "N/A")
+            corretor_custom = fields.get(CUSTOM_FIELD_CORRETOR)
+            anuncio_lead = fields.get(CUSTOM_FIELD_ANUNCIO, "N/A")  # Novo campo
+            publico_lead = fields.get(CUSTOM_FIELD_PUBLICO, "N/A")  # Novo campo (conjunto de anúncios)
+            produto_lead = fields.get(CUSTOM_FIELD_PRODUTO, "N/A")  # Campo Produto
+            data_proposta_raw = fields.get(CUSTOM_FIELD_DATA_PROPOSTA)  # Valor bruto (usado em is_proposta)
+            data_proposta_lead = format_timestamp_brazil(parse_closure_date(data_proposta_raw))  # Campo Data da Proposta
 
             # Determinar corretor final
             if corretor_custom:
@@ -1712,48 +1671,28 @@ async def get_detailed_tables(
             else:
                 funil = "Não atribuído"
             
-            # Filtrar por corretor se especificado
-            if corretor and isinstance(corretor, str) and corretor.strip():
-                if ',' in corretor:
-                    corretores_list = [c.strip() for c in corretor.split(',')]
-                    if corretor_final not in corretores_list:
-                        continue
-                else:
-                    if corretor_final != corretor:
-                        continue
+            # Filtrar por corretor se especificado (frozenset pré-calculado)
+            if corretor_filter is not None and corretor_final not in corretor_filter:
+                continue
                 
             # Filtrar por fonte se especificado - suporta múltiplos valores separados por vírgula
-            if fonte and isinstance(fonte, str) and fonte.strip():
-                if ',' in fonte:
-                    fontes_list = [f.strip() for f in fonte.split(',')]
-                    if fonte_lead not in fontes_list:
-                        continue
-                else:
-                    if fonte_lead != fonte:
-                        continue
+            if fonte_filter is not None and fonte_lead not in fonte_filter:
+                continue
             
             # Mapear status_id para nome do status
-            status_name = "Ativo"  # Padrão
-            if status_id == 142:
-                status_name = "Venda Concluída"
-            elif status_id == 143:
-                status_name = "Perdido"
-            elif status_id == STATUS_CONTRATO_ASSINADO:
-                status_name = "Contrato Assinado"
-            elif status_id in [80689711, 80689715, 80689719, 80689723, 80689727]:
-                status_name = "Em Negociação"
+            status_name = STATUS_NAME_MAP.get(status_id, "Ativo")
             
             # Determinar etapa baseado no status_id usando nomes reais da API
             etapa = status_map.get(status_id, f"Status {status_id}")
             
             # Formatar data de criação
             if created_at:
-                data_criacao_formatada = format_timestamp_brazil(created_at, "%Y-%m-%d")
+                data_criacao_formatada = _format_date_brazil(created_at)
             else:
                 data_criacao_formatada = "N/A"
             
             # Verificar se é uma proposta usando o novo campo boolean
-            is_lead_proposta = is_proposta(lead)
+            is_lead_proposta = is_proposta(lead, data_proposta_raw)
             
             # Criar objeto do lead
             lead_obj = {
@@ -1774,22 +1713,27 @@ async def get_detailed_tables(
             # Separar entre orgânicos e leads não-orgânicos baseado na fonte
             if fonte_lead == "Orgânico":
                 organicos_detalhes.append(lead_obj)
+                if is_lead_proposta:
+                    total_propostas_organicos_boolean += 1
             else:
                 leads_detalhes.append(lead_obj)
+                if is_lead_proposta:
+                    total_propostas_leads_boolean += 1
         
         # PROPOSTAS serão processadas depois dos totais serem calculados
         
         # Ordenar leads por data de criação (mais recentes primeiro)
-        leads_detalhes.sort(key=lambda x: x["Data de Criação"], reverse=True)
-        organicos_detalhes.sort(key=lambda x: x["Data de Criação"], reverse=True)
+        by_created = itemgetter("Data de Criação")
+        leads_detalhes.sort(key=by_created, reverse=True)
+        organicos_detalhes.sort(key=by_created, reverse=True)
         
         # Ordenar as listas por data (mais recentes primeiro)
-        reunioes_detalhes.sort(key=lambda x: datetime.strptime(x["Data da Reunião"], "%d/%m/%Y %H:%M"), reverse=True)
-        reunioes_organicas_detalhes.sort(key=lambda x: datetime.strptime(x["Data da Reunião"], "%d/%m/%Y %H:%M"), reverse=True)
-        vendas_detalhes.sort(key=lambda x: datetime.strptime(x["Data da Venda"], "%d/%m/%Y %H:%M"), reverse=True)
+        reunioes_detalhes.sort(key=lambda x: _br_datetime_sort_key(x["Data da Reunião"]), reverse=True)
+        reunioes_organicas_detalhes.sort(key=lambda x: _br_datetime_sort_key(x["Data da Reunião"]), reverse=True)
+        vendas_detalhes.sort(key=lambda x: _br_datetime_sort_key(x["Data da Venda"]), reverse=True)
         
-        # NOVO: Ordenar propostas por data da proposta (mais recentes primeiro)
-        propostas_detalhes.sort(key=lambda x: datetime.strptime(x["Data da Proposta"], "%d/%m/%Y %H:%M") if x["Data da Proposta"] != "N/A" else datetime.min, reverse=True)
+        # NOVO: Ordenar propostas por data da proposta (mais recentes primeiro; "N/A" por último)
+        propostas_detalhes.sort(key=lambda x: _br_datetime_sort_key(x["Data da Proposta"]), reverse=True)
         
         # Calcular totais
         total_leads = len(leads_detalhes)  # Leads não-orgânicos
@@ -1799,14 +1743,12 @@ async def get_detailed_tables(
         total_vendas = len(vendas_detalhes)
         
         # NOVO: Contar propostas usando o campo boolean (contagem anterior para compatibilidade)
-        total_propostas_leads_boolean = sum(1 for lead in leads_detalhes if lead.get("É Proposta") == True)
-        total_propostas_organicos_boolean = sum(1 for lead in organicos_detalhes if lead.get("É Proposta") == True)
         total_propostas_geral_boolean = total_propostas_leads_boolean + total_propostas_organicos_boolean
         
         # NOVO: Processar propostas detalhadas DEPOIS dos totais serem calculados
         # OTIMIZAÇÃO v2: Buscar propostas com aiohttp + asyncio.gather (verdadeiramente paralelo)
         # Baseado em: https://proxiesapi.com/articles/making-fast-parallel-requests-with-asyncio
-        propostas_start = time_module.time()
+        propostas_start = time.time()
         logger.info("Processando propostas detalhadas com aiohttp (paralelo verdadeiro)...")
 
         # Buscar TODOS os leads sem filtro de data de criação para encontrar todas as propostas
@@ -1835,9 +1777,9 @@ async def get_detailed_tables(
             leads_vendas_propostas = results[0] if len(results) > 0 else []
             leads_remarketing_propostas = results[1] if len(results) > 1 else []
 
-            propostas_elapsed = time_module.time() - propostas_start
-            logger.info(f"Busca propostas ASYNC concluída em {propostas_elapsed:.2f}s")
-            logger.info(f"Propostas Vendas: {len(leads_vendas_propostas)}, Remarketing: {len(leads_remarketing_propostas)}")
+            propostas_elapsed = time.time() - propostas_start
+            logger.info("Busca propostas ASYNC concluída em %.2fs", propostas_elapsed)
+            logger.info("Propostas Vendas: %s, Remarketing: %s", len(leads_vendas_propostas), len(leads_remarketing_propostas))
 
             # Combinar todos os leads
             all_leads_propostas = leads_vendas_propostas + leads_remarketing_propostas
@@ -1847,8 +1789,11 @@ async def get_detailed_tables(
                 if not lead:
                     continue
                     
+                # Extrair todos os campos customizados necessários em uma única passada
+                fields = extract_custom_fields(lead, DETAIL_FIELD_IDS)
+
                 # Validar se é proposta no período correto
-                if not validate_proposta_in_period(lead, start_timestamp, end_timestamp):
+                if not validate_proposta_in_period(lead, start_timestamp, end_timestamp, fields.get(CUSTOM_FIELD_DATA_PROPOSTA)):
                     continue
                 
                 lead_name = lead.get("name", "")
@@ -1856,36 +1801,24 @@ async def get_detailed_tables(
                 status_id = lead.get("status_id")
                 pipeline_id = lead.get("pipeline_id")
 
-                # Extrair campos customizados
-                fonte_lead = extract_custom_field_value(lead, 837886) or "N/A"
-                corretor_custom = extract_custom_field_value(lead, 837920)  # Corretor
-                anuncio_lead = extract_custom_field_value(lead, 837846) or "N/A"
-                publico_lead = extract_custom_field_value(lead, 837844) or "N/A"
-                produto_lead = extract_custom_field_value(lead, CUSTOM_FIELD_PRODUTO) or "N/A"
-                data_proposta_lead = format_proposal_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)
+                # Campos customizados (já extraídos acima)
+                fonte_lead = fields.get(CUSTOM_FIELD_FONTE) or "N/A"
+                corretor_custom = fields.get(CUSTOM_FIELD_CORRETOR)  # Corretor
+                anuncio_lead = fields.get(CUSTOM_FIELD_ANUNCIO) or "N/A"
+                publico_lead = fields.get(CUSTOM_FIELD_PUBLICO) or "N/A"
+                produto_lead = fields.get(CUSTOM_FIELD_PRODUTO) or "N/A"
+                data_proposta_lead = format_timestamp_brazil(parse_closure_date(fields.get(CUSTOM_FIELD_DATA_PROPOSTA)))
 
                 # Determinar corretor final
                 corretor_final = corretor_custom or "Não atribuído"
                 
-                # Filtrar por corretor se especificado
-                if corretor and isinstance(corretor, str) and corretor.strip():
-                    if ',' in corretor:
-                        corretores_list = [c.strip() for c in corretor.split(',')]
-                        if corretor_final not in corretores_list:
-                            continue
-                    else:
-                        if corretor_final != corretor:
-                            continue
+                # Filtrar por corretor se especificado (frozenset pré-calculado)
+                if corretor_filter is not None and corretor_final not in corretor_filter:
+                    continue
                 
                 # Filtrar por fonte se especificado
-                if fonte and isinstance(fonte, str) and fonte.strip():
-                    if ',' in fonte:
-                        fontes_list = [f.strip() for f in fonte.split(',')]
-                        if fonte_lead not in fontes_list:
-                            continue
-                    else:
-                        if fonte_lead != fonte:
-                            continue
+                if fonte_filter is not None and fonte_lead not in fonte_filter:
+                    continue
                 
                 # Determinar funil baseado no pipeline_id
                 if pipeline_id == PIPELINE_VENDAS:
@@ -1896,28 +1829,20 @@ async def get_detailed_tables(
                     funil = "Não atribuído"
                 
                 # Mapear status_id para nome do status
-                status_name = "Ativo"
-                if status_id == 142:
-                    status_name = "Venda Concluída"
-                elif status_id == 143:
-                    status_name = "Perdido"
-                elif status_id == STATUS_CONTRATO_ASSINADO:
-                    status_name = "Contrato Assinado"
-                elif status_id in [80689711, 80689715, 80689719, 80689723, 80689727]:
-                    status_name = "Em Negociação"
+                status_name = STATUS_NAME_MAP.get(status_id, "Ativo")
                 
                 # Determinar etapa baseado no status_id
                 etapa = status_map.get(status_id, f"Status {status_id}")
                 
                 # Formatar data de criação do lead
                 if created_at:
-                    data_criacao_formatada = format_timestamp_brazil(created_at, "%Y-%m-%d")
+                    data_criacao_formatada = _format_date_brazil(created_at)
                 else:
                     data_criacao_formatada = "N/A"
                 
                 # Buscar valor (price) do lead
                 price = lead.get("price", 0) or 0
-                valor_formatado = f"R$ {price:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+                valor_formatado = _format_brl(price)
 
                 # Criar objeto da proposta
                 proposta_dict = {
@@ -1939,15 +1864,11 @@ async def get_detailed_tables(
                 propostas_detalhes.append(proposta_dict)
                 
         except Exception as e:
-            logger.error(f"Erro ao processar propostas: {e}")
+            logger.error("Erro ao processar propostas: %s", e)
         
         # Contar propostas detalhadas finais
         total_propostas_detalhes = len(propostas_detalhes)
 
-        valor_total_vendas = sum(
-            float(v["Valor da Venda"].replace("R$ ", "").replace(".", "").replace(",", "."))
-            for v in vendas_detalhes
-        )
 
         # Calcular receita prevista
         # Inclui leads com Data da Proposta OU Data Fechamento no período
@@ -1970,9 +1891,10 @@ async def get_detailed_tables(
             if etapa_lead not in etapas_receita_prevista:
                 continue
 
-            # Buscar Data da Proposta E Data Fechamento
-            data_proposta_ts = get_lead_closure_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)
-            data_fechamento_ts = get_lead_closure_date(lead, CUSTOM_FIELD_DATA_FECHAMENTO)
+            # Buscar Data da Proposta E Data Fechamento (e demais campos) em uma única passada
+            fields = extract_custom_fields(lead, SALE_FIELD_IDS)
+            data_proposta_ts = parse_closure_date(fields.get(CUSTOM_FIELD_DATA_PROPOSTA))
+            data_fechamento_ts = parse_closure_date(fields.get(CUSTOM_FIELD_DATA_FECHAMENTO))
 
             # Verificar se alguma das datas está no período
             proposta_no_periodo = (start_timestamp <= data_proposta_ts <= end_timestamp) if data_proposta_ts else False
@@ -1983,11 +1905,11 @@ async def get_detailed_tables(
                 receita_prevista += float(price)
 
                 # Extrair campos customizados para a tabela detalhada
-                fonte_lead = extract_custom_field_value(lead, 837886) or "N/A"
-                corretor_custom = extract_custom_field_value(lead, 837920)  # Corretor
+                fonte_lead = fields.get(CUSTOM_FIELD_FONTE) or "N/A"
+                corretor_custom = fields.get(CUSTOM_FIELD_CORRETOR)  # Corretor
                 corretor_final = corretor_custom or "Não atribuído"
-                data_proposta_formatada = format_proposal_date(lead, CUSTOM_FIELD_DATA_PROPOSTA)
-                data_fechamento_formatada = format_proposal_date(lead, CUSTOM_FIELD_DATA_FECHAMENTO)
+                data_proposta_formatada = format_timestamp_brazil(data_proposta_ts)
+                data_fechamento_formatada = format_timestamp_brazil(data_fechamento_ts)
                 pipeline_id = lead.get("pipeline_id")
 
                 # Determinar funil
@@ -1998,7 +1920,7 @@ async def get_detailed_tables(
                 else:
                     funil = "Não atribuído"
 
-                valor_formatado = f"R$ {price:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+                valor_formatado = _format_brl(price)
 
                 receita_prevista_detalhes.append({
                     "Nome do Lead": lead_name,
@@ -2011,7 +1933,7 @@ async def get_detailed_tables(
                     "Valor": valor_formatado
                 })
 
-        logger.info(f"Receita Prevista calculada: R$ {receita_prevista:,.2f} ({len(receita_prevista_detalhes)} leads)")
+        logger.info("Receita Prevista calculada: R$ %.2f (%s leads)", receita_prevista, len(receita_prevista_detalhes))
 
         # Montar resposta
         response = {
@@ -2070,11 +1992,12 @@ async def get_detailed_tables(
             }
         }
         
-        logger.info(f"Tabelas detalhadas geradas: {total_reunioes} reuniões, {total_vendas} vendas, {total_propostas_geral_boolean} propostas (boolean), {total_propostas_detalhes} propostas detalhadas (filtradas por Data da Proposta)")
-        return response
+        logger.info("Tabelas detalhadas geradas: %d reuniões, %d vendas, %d propostas (boolean), %d propostas detalhadas (filtradas por Data da Proposta)",
+                    total_reunioes, total_vendas, total_propostas_geral_boolean, total_propostas_detalhes)
+        return ORJSONResponse(response)
         
     except Exception as e:
-        logger.error(f"Erro ao gerar tabelas detalhadas: {str(e)}")
+        logger.error("Erro ao gerar tabelas detalhadas: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
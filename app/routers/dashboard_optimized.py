@@ -4,6 +4,7 @@ Performance esperada: < 500ms vs 5-10s dos endpoints antigos
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List, Dict, Any
 import logging
 from datetime import datetime, timedelta
@@ -180,7 +181,7 @@ def build_leads_query(
     return query
 
 
-@router.get("/sales-complete")
+@router.get("/sales-complete", response_class=ORJSONResponse)
 async def get_sales_complete_v2(
     days: int = Query(90, description="Periodo em dias para analise"),
     corretor: Optional[str] = Query(None, description="Nome do corretor para filtrar dados"),
@@ -416,7 +417,7 @@ async def get_sales_complete_v2(
         elapsed = time.time() - start_time
         logger.info(f"[V2] sales-complete concluido em {elapsed:.3f}s - {total_leads} leads")
 
-        return {
+        return ORJSONResponse({
             "totalLeads": total_leads,
             "leadsByUser": sorted(leads_by_user, key=lambda x: x["value"], reverse=True),
             "leadsByStage": leads_by_stage,
@@ -448,7 +449,7 @@ async def get_sales_complete_v2(
                 "elapsed_ms": round(elapsed * 1000, 2),
                 "source": "mongodb"
             }
-        }
+        })
 
     except HTTPException:
         raise
@@ -457,7 +458,7 @@ async def get_sales_complete_v2(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/detailed-tables")
+@router.get("/detailed-tables", response_class=ORJSONResponse)
 async def get_detailed_tables_v2(
     corretor: Optional[str] = Query(None, description="Nome do corretor"),
     fonte: Optional[str] = Query(None, description="Fonte"),
@@ -864,7 +865,7 @@ async def get_detailed_tables_v2(
         elapsed = time.time() - start_time
         logger.info(f"[V2] detailed-tables concluido em {elapsed:.3f}s")
 
-        return {
+        return ORJSONResponse({
             "leadsDetalhes": leads_detalhes,
             "organicosDetalhes": organicos_detalhes,
             "reunioesDetalhes": reunioes_detalhes,
@@ -886,7 +887,7 @@ async def get_detailed_tables_v2(
                 "source": "mongodb",
                 "generated_at": datetime.now().isoformat()
             }
-        }
+        })
 
     except HTTPException:
         raise
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Query, HTTPException, Path
 from typing import Dict, List, Optional
+from collections import Counter, defaultdict
 from app.services.kommo_api import get_kommo_api
+from app.utils.date_helpers import extract_custom_fields
 import traceback
 
 router = APIRouter(prefix="/leads", tags=["Leads"])
@@ -121,7 +123,7 @@ async def get_leads_by_source():
         if not data:
             return {"leads_by_source": {}, "message": "Não foi possível obter leads"}
         
-        results = {}
+        results = Counter()
         embedded = data.get("_embedded", {})
         if embedded:
             leads = embedded.get("leads", [])
@@ -130,9 +132,9 @@ async def get_leads_by_source():
                 if source_id is not None:
                     source_id_str = str(source_id)
                     source_name = sources_map.get(source_id_str, f"Fonte {source_id}")
-                    results[source_name] = results.get(source_name, 0) + 1
+                    results[source_name] += 1
                 else:
-                    results["Sem fonte"] = results.get("Sem fonte", 0) + 1
+                    results["Sem fonte"] += 1
             
         return {"leads_by_source": results}
     except Exception as e:
@@ -150,7 +152,7 @@ async def get_leads_by_tag():
         if not data:
             return {"leads_by_tag": {}, "message": "Não foi possível obter leads"}
             
-        tags = {}
+        tags = Counter()
         embedded = data.get("_embedded", {})
         if embedded:
             leads = embedded.get("leads", [])
@@ -160,7 +162,7 @@ async def get_leads_by_tag():
                     lead_tags = lead_embedded.get("tags", [])
                     for tag in lead_tags:
                         tag_name = tag.get("name", "Sem tag")
-                        tags[tag_name] = tags.get(tag_name, 0) + 1
+                        tags[tag_name] += 1
                 
         # Se não encontramos nenhuma tag
         if not tags:
@@ -217,7 +219,7 @@ async def get_leads_by_advertisement(
         leads = data.get("_embedded", {}).get("leads", [])
         
         # Agrupar por valor do campo personalizado
-        results = {}
+        results = Counter()
         
         for lead in leads:
             custom_fields = lead.get("custom_fields_values", [])
@@ -233,7 +235,7 @@ async def get_leads_by_advertisement(
                     for field_value in field_values:
                         value = str(field_value.get("value", ""))
                         if value:
-                            results[value] = results.get(value, 0) + 1
+                            results[value] += 1
                     break
         
         return {"leads_by_advertisement": results}
@@ -296,15 +298,15 @@ async def get_leads_by_user(
         if not all_leads:
             return {"leads_by_user": {}, "message": "Não foi possível obter leads"}
             
-        results = {}
+        results = Counter()
         for lead in all_leads:
             user_id = lead.get("responsible_user_id")
             if user_id is not None:
                 user_id_str = str(user_id)
                 user_name = users_map.get(user_id_str, f"Usuário {user_id}")
-                results[user_name] = results.get(user_name, 0) + 1
+                results[user_name] += 1
             else:
-                results["Sem responsável"] = results.get("Sem responsável", 0) + 1
+                results["Sem responsável"] += 1
             
         return {"leads_by_user": results}
     except Exception as e:
@@ -370,7 +372,7 @@ async def get_active_leads_by_user():
             return {"active_leads_by_user": {}, "message": "Nenhum estágio ativo encontrado"}
             
         # Obter leads para cada estágio ativo
-        results = {}
+        results = Counter()
         
         for active_status in active_statuses:
             pipeline_id = active_status["pipeline_id"]
@@ -397,7 +399,7 @@ async def get_active_leads_by_user():
                 if user_id is not None:
                     user_id_str = str(user_id)
                     user_name = users_map.get(user_id_str, f"Usuário {user_id}")
-                    results[user_name] = results.get(user_name, 0) + 1
+                    results[user_name] += 1
         
         return {"active_leads_by_user": results}
     except Exception as e:
@@ -462,7 +464,7 @@ async def get_lost_leads_by_user():
             return {"lost_leads_by_user": {}, "message": "Nenhum estágio perdido encontrado"}
             
         # Obter leads para cada estágio perdido
-        results = {}
+        results = Counter()
         
         for lost_status in lost_statuses:
             pipeline_id = lost_status["pipeline_id"]
@@ -489,7 +491,7 @@ async def get_lost_leads_by_user():
                 if user_id is not None:
                     user_id_str = str(user_id)
                     user_name = users_map.get(user_id_str, f"Usuário {user_id}")
-                    results[user_name] = results.get(user_name, 0) + 1
+                    results[user_name] += 1
         
         return {"lost_leads_by_user": results}
     except Exception as e:
@@ -542,7 +544,7 @@ async def get_leads_by_stage():
         if not data:
             return {"leads_by_stage": {}, "message": "Não foi possível obter leads"}
             
-        stages = {}
+        stages = Counter()
         embedded = data.get("_embedded", {})
         
         if embedded:
@@ -556,7 +558,7 @@ async def get_leads_by_stage():
                     key = f"{pipeline_id}_{status_id}"
                     stage_name = pipeline_stages_map.get(key, f"Pipeline {pipeline_id} - Estágio {status_id}")
                     
-                    stages[stage_name] = stages.get(stage_name, 0) + 1
+                    stages[stage_name] += 1
             
         return {"leads_by_stage": stages}
     except Exception as e:
@@ -861,34 +863,26 @@ async def get_leads_conversion_rate(
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+CUSTOM_FIELD_CORRETOR = 837920
+_CORRETOR_FIELD_IDS = frozenset({CUSTOM_FIELD_CORRETOR})
+
 # Função auxiliar para filtrar leads por corretor (custom field)
 def filter_leads_by_corretor(leads: list, corretor_name: str) -> list:
     """Filtra leads pelo campo personalizado 'Corretor' (field_id: 837920)"""
     if not corretor_name or not leads:
         return leads if leads else []
     
-    filtered_leads = []
-    for lead in leads:
-        if not lead:  # Proteção contra leads None
-            continue
-            
-        custom_fields = lead.get("custom_fields_values", [])
-        if not custom_fields:  # Proteção contra custom_fields None
-            continue
-            
-        for field in custom_fields:
-            if not field:  # Proteção contra field None
-                continue
-                
-            if field.get("field_id") == 837920:  # ID do campo Corretor
-                values = field.get("values", [])
-                if values and len(values) > 0:
-                    value = values[0].get("value") if values[0] else None
-                    if value == corretor_name:
-                        filtered_leads.append(lead)
-                        break
+    # Resolvido uma vez fora do loop: um ou vários corretores (separados por vírgula)
+    if ',' in corretor_name:
+        corretores = frozenset(c.strip() for c in corretor_name.split(','))
+    else:
+        corretores = frozenset({corretor_name})
     
-    return filtered_leads
+    # Um único extract_custom_fields por lead (sem varredura manual dos campos) em uma list comprehension
+    return [
+        lead for lead in leads
+        if lead and extract_custom_fields(lead, _CORRETOR_FIELD_IDS).get(CUSTOM_FIELD_CORRETOR) in corretores
+    ]
 
 # Função auxiliar para obter todos os leads (paginação automática)
 def get_all_leads_with_custom_fields():
@@ -930,7 +924,7 @@ async def get_active_leads_by_corretor(
         
         if include_all:
             # Retornar contagem por todos os corretores
-            corretor_counts = {}
+            corretor_counts = Counter()
             
             for lead in all_leads:
                 # Verificar se é ativo (não won e não lost)
@@ -944,7 +938,7 @@ async def get_active_leads_by_corretor(
                         if values:
                             corretor = values[0].get("value", "")
                             if corretor:
-                                corretor_counts[corretor] = corretor_counts.get(corretor, 0) + 1
+                                corretor_counts[corretor] += 1
                         break
             
             return {"active_leads_by_corretor": corretor_counts}
@@ -981,7 +975,7 @@ async def get_lost_leads_by_corretor(
         
         if include_all:
             # Retornar contagem por todos os corretores
-            corretor_counts = {}
+            corretor_counts = Counter()
             
             for lead in all_leads:
                 # Verificar se é perdido (status lost)
@@ -995,7 +989,7 @@ async def get_lost_leads_by_corretor(
                         if values:
                             corretor = values[0].get("value", "")
                             if corretor:
-                                corretor_counts[corretor] = corretor_counts.get(corretor, 0) + 1
+                                corretor_counts[corretor] += 1
                         break
             
             return {"lost_leads_by_corretor": corretor_counts}
@@ -1032,7 +1026,7 @@ async def get_won_leads_by_corretor(
         
         if include_all:
             # Retornar contagem por todos os corretores
-            corretor_counts = {}
+            corretor_counts = Counter()
             corretor_revenue = {}
             
             for lead in all_leads:
@@ -1047,7 +1041,7 @@ async def get_won_leads_by_corretor(
                         if values:
                             corretor = values[0].get("value", "")
                             if corretor:
-                                corretor_counts[corretor] = corretor_counts.get(corretor, 0) + 1
+                                corretor_counts[corretor] += 1
                                 corretor_revenue[corretor] = corretor_revenue.get(corretor, 0) + (lead.get("price", 0) or 0)
                         break
             
@@ -1107,7 +1101,7 @@ async def get_leads_by_stage_and_corretor(
         
         if include_all:
             # Retornar contagem por todos os corretores e estágios
-            corretor_stages = {}
+            corretor_stages = defaultdict(Counter)
             
             for lead in all_leads:
                 status_id = lead.get("status_id")
@@ -1120,9 +1114,7 @@ async def get_leads_by_stage_and_corretor(
                         if values:
                             corretor = values[0].get("value", "")
                             if corretor:
-                                if corretor not in corretor_stages:
-                                    corretor_stages[corretor] = {}
-                                corretor_stages[corretor][stage_name] = corretor_stages[corretor].get(stage_name, 0) + 1
+                                corretor_stages[corretor][stage_name] += 1
                         break
             
             return {"leads_by_stage_and_corretor": corretor_stages}
@@ -1132,11 +1124,11 @@ async def get_leads_by_stage_and_corretor(
             corretor_leads = filter_leads_by_corretor(all_leads, corretor_name)
             
             # Agrupar por estágio
-            stage_counts = {}
+            stage_counts = Counter()
             for lead in corretor_leads:
                 status_id = lead.get("status_id")
                 stage_name = stage_map.get(status_id, f"Status {status_id}")
-                stage_counts[stage_name] = stage_counts.get(stage_name, 0) + 1
+                stage_counts[stage_name] += 1
             
             return {
                 "corretor": corretor_name,
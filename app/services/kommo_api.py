@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional, Union, Any
 import config
 from datetime import datetime
@@ -12,7 +13,9 @@ import pickle
 import logging
 import asyncio
 import aiohttp
+from contextlib import asynccontextmanager
 import threading
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +103,91 @@ class KommoAPI:
         # Referência ao rate limiter global
         self._rate_limiter = _rate_limiter
 
+        # Sessões HTTP por thread: reaproveitam conexões TCP/TLS (keep-alive) com a API Kommo em vez
+        # de abrir uma conexão nova a cada requests.get. requests.Session não é documentada como
+        # thread-safe (cookies e adapters mudam a cada requisição) e o cliente é chamado de várias
+        # threads ao mesmo tempo (asyncio.to_thread, ThreadPoolExecutor), então cada thread tem a sua.
+        self._thread_local = threading.local()
+        self._thread_sessions = weakref.WeakSet()  # para close(); sessões de threads encerradas são coletadas
+        self._thread_sessions_lock = threading.Lock()
+
+        # Sessão aiohttp compartilhada dos métodos async, aberta no startup da aplicação (aopen)
+        self._shared_async_session = None
+        self._async_session_loop = None
+
+    @property
+    def _session(self) -> requests.Session:
+        """Sessão requests da thread atual (criada na primeira requisição da thread)"""
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = self._create_session()
+            self._thread_local.session = session
+            with self._thread_sessions_lock:
+                self._thread_sessions.add(session)
+        return session
+
+    def _create_session(self) -> requests.Session:
+        """Cria sessão requests com pool de conexões (uma thread usa uma conexão por vez)"""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _new_async_session(self) -> aiohttp.ClientSession:
+        """Cria ClientSession com pool dimensionado para chamadas concorrentes (headers vão por requisição)"""
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=30, limit_per_host=20),
+            timeout=aiohttp.ClientTimeout(total=30, connect=10)
+        )
+
+    async def aopen(self):
+        """Abre a sessão aiohttp compartilhada no event loop atual (chamar no startup da aplicação)"""
+        if self._shared_async_session is None or self._shared_async_session.closed:
+            self._shared_async_session = self._new_async_session()
+            self._async_session_loop = asyncio.get_running_loop()
+
+    @asynccontextmanager
+    async def _async_session(self):
+        """
+        Sessão aiohttp para os métodos async. A sessão compartilhada (aberta por aopen no loop da
+        aplicação) mantém as conexões TCP/TLS com a Kommo no pool entre chamadas. Chamadas vindas de
+        outro loop (ex.: asyncio.run em uma thread do scheduler), ou antes do aopen, usam uma sessão
+        própria, fechada ao final da chamada no mesmo loop que a criou.
+        Os headers (token) são enviados por requisição, então mudanças em self.headers valem na hora.
+        """
+        session = self._shared_async_session
+        if session is not None and not session.closed and self._async_session_loop is asyncio.get_running_loop():
+            yield session
+        else:
+            async with self._new_async_session() as own_session:
+                yield own_session
+
+    def close(self):
+        """Fecha as sessões HTTP das threads (conexões dos pools)"""
+        with self._thread_sessions_lock:
+            sessions = list(self._thread_sessions)
+            self._thread_sessions.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar sessão HTTP Kommo: {e}")
+
+    async def aclose(self):
+        """Fecha a sessão aiohttp compartilhada (chamar no shutdown da aplicação, no mesmo loop do aopen)"""
+        session, self._shared_async_session = self._shared_async_session, None
+        loop, self._async_session_loop = self._async_session_loop, None
+        if loop is not None and loop is not asyncio.get_running_loop():
+            logger.warning("aclose chamado fora do loop que abriu a sessão aiohttp Kommo; sessão não fechada")
+            return
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar sessão aiohttp Kommo: {e}")
+
     def _init_redis(self):
         """Inicializa conexão Redis"""
         try:
@@ -205,7 +293,7 @@ class KommoAPI:
                 # Aplicar rate limiter ANTES de cada requisição
                 self._rate_limiter.wait()
 
-                response = requests.get(url, headers=self.headers, params=params)
+                response = self._session.get(url, params=params)
                 
                 # Imprimir informações para debug (apenas na primeira tentativa)
                 if attempt == 0:
@@ -434,7 +522,7 @@ class KommoAPI:
         url = f"{self.base_url}/leads"
         
         try:
-            response = requests.get(url, headers=self.headers, params=params_copy, timeout=30)
+            response = self._session.get(url, params=params_copy, timeout=30)
             print(f"Página {page}: Status {response.status_code}")
             if response.status_code == 200:
                 return response.json()
@@ -573,7 +661,51 @@ class KommoAPI:
         
         return all_leads
 
-    async def get_all_leads_async(self, params: Optional[Dict] = None, max_pages: int = 15) -> List[Dict]:
+    async def _get_json_with_retry(self, session: aiohttp.ClientSession, url: str, params, label: str,
+                                   rate_limiter: AsyncGlobalRateLimiter, max_retries: int = 3) -> Dict:
+        """GET com rate limit, retry e backoff exponencial (429, erro HTTP, timeout) para os métodos async
+
+        Returns:
+            {"data": ..., "success": bool}; 204 vem com "empty": True e falhas com "error"
+        """
+        for attempt in range(max_retries):
+            try:
+                # Aplicar rate limiter ANTES de cada requisição
+                await rate_limiter.wait()
+                async with session.get(url, params=params, headers=self.headers) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return {"data": data, "success": True}
+                    elif response.status == 204:
+                        return {"data": None, "success": True, "empty": True}
+                    elif response.status == 429:  # Rate limited
+                        wait_time = (2 ** attempt) * 0.5  # Backoff: 0.5s, 1s, 2s
+                        logger.warning(f"{label}: Rate limited, aguardando {wait_time}s...")
+                        await asyncio.sleep(wait_time)
+                        continue
+                    else:
+                        logger.warning(f"{label}: Status {response.status}")
+                        if attempt < max_retries - 1:
+                            await asyncio.sleep(0.5 * (attempt + 1))
+                            continue
+                        return {"data": None, "success": False, "error": f"status {response.status}"}
+            except asyncio.TimeoutError:
+                logger.warning(f"{label}: Timeout (tentativa {attempt + 1}/{max_retries})")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(1 * (attempt + 1))
+                    continue
+                return {"data": None, "success": False, "error": "timeout"}
+            except Exception as e:
+                logger.error(f"{label}: Erro {str(e)} (tentativa {attempt + 1}/{max_retries})")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+                    continue
+                return {"data": None, "success": False, "error": str(e)}
+
+        return {"data": None, "success": False, "error": "max_retries"}
+
+    async def get_all_leads_async(self, params: Optional[Dict] = None, max_pages: int = 15,
+                                  raise_on_failure: bool = False) -> List[Dict]:
         """
         Obtém todos os leads usando aiohttp para requisições paralelas controladas.
 
@@ -581,10 +713,13 @@ class KommoAPI:
         - Semáforo para controlar concorrência (respeita rate limit Kommo: 7 req/s)
         - Retry com backoff exponencial em caso de falha
         - Tratamento adequado de rate limiting (429)
+        - Páginas buscadas em ondas paralelas, parando na primeira página incompleta
 
         Args:
             params: Parâmetros da consulta
             max_pages: Máximo de páginas a buscar (default: 15)
+            raise_on_failure: Se True, levanta exceção quando alguma página falha após os retries
+                (em vez de devolver a lista parcial)
 
         Returns:
             Lista com todos os leads
@@ -601,62 +736,28 @@ class KommoAPI:
         # Rate limiter global async (compartilhado entre todas as chamadas)
         rate_limiter = get_async_rate_limiter()
 
-        async def fetch_page_with_retry(session: aiohttp.ClientSession, page: int, max_retries: int = 3) -> Dict:
+        async def fetch_page_with_retry(session: aiohttp.ClientSession, page: int) -> Dict:
             """Busca uma página com retry e backoff exponencial"""
             page_params = params.copy()
             page_params['page'] = page
             page_params['limit'] = 250
 
-            for attempt in range(max_retries):
-                try:
-                    # Aplicar rate limiter ANTES de cada requisição
-                    await rate_limiter.wait()
-                    async with session.get(base_url, params=page_params) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            return {"page": page, "data": data, "success": True}
-                        elif response.status == 204:
-                            return {"page": page, "data": None, "success": True, "empty": True}
-                        elif response.status == 429:  # Rate limited
-                            wait_time = (2 ** attempt) * 0.5  # Backoff: 0.5s, 1s, 2s
-                            logger.warning(f"Página {page}: Rate limited, aguardando {wait_time}s...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            logger.warning(f"Página {page}: Status {response.status}")
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(0.5 * (attempt + 1))
-                                continue
-                            return {"page": page, "data": None, "success": False}
-                except asyncio.TimeoutError:
-                    logger.warning(f"Página {page}: Timeout (tentativa {attempt + 1}/{max_retries})")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(1 * (attempt + 1))
-                        continue
-                    return {"page": page, "data": None, "success": False, "error": "timeout"}
-                except Exception as e:
-                    logger.error(f"Página {page}: Erro {str(e)} (tentativa {attempt + 1}/{max_retries})")
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(0.5 * (attempt + 1))
-                        continue
-                    return {"page": page, "data": None, "success": False, "error": str(e)}
-
-            return {"page": page, "data": None, "success": False, "error": "max_retries"}
+            result = await self._get_json_with_retry(session, base_url, page_params, f"Página {page}", rate_limiter)
+            result["page"] = page
+            return result
 
-        # Usar um único ClientSession para melhor performance (connection pooling)
-        # Otimizado: mais conexões para maximizar throughput com rate limit de 7 req/s
-        connector = aiohttp.TCPConnector(limit=15, limit_per_host=10)
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-
-        async with aiohttp.ClientSession(
-            headers=self.headers,
-            connector=connector,
-            timeout=timeout
-        ) as session:
+        # ClientSession compartilhado entre chamadas (connection pooling / keep-alive)
+        async with self._async_session() as session:
             # Primeira requisição para verificar se há dados
             first_result = await fetch_page_with_retry(session, 1)
 
-            if not first_result["success"] or first_result.get("empty"):
+            if not first_result["success"]:
+                if raise_on_failure:
+                    raise Exception(f"get_all_leads_async: falha ao buscar a página 1 ({first_result.get('error')})")
+                logger.info("get_all_leads_async: Nenhum dado encontrado")
+                return []
+
+            if first_result.get("empty"):
                 logger.info("get_all_leads_async: Nenhum dado encontrado")
                 return []
 
@@ -674,51 +775,63 @@ class KommoAPI:
                 logger.info(f"get_all_leads_async: CONCLUÍDO - {len(all_leads)} leads em 1 página em {elapsed:.2f}s")
                 return all_leads
 
-            # Buscar páginas 2 a max_pages em paralelo com controle de concorrência
-            pages_to_fetch = list(range(2, max_pages + 1))
-            logger.info(f"Buscando páginas {pages_to_fetch} em paralelo (semaphore=5)...")
-
-            # Criar tasks para todas as páginas
-            tasks = [fetch_page_with_retry(session, page) for page in pages_to_fetch]
-
-            # Executar todas em paralelo (semáforo controla a concorrência real)
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Processar resultados e contar falhas
+            # Buscar páginas 2 a max_pages em ondas paralelas (o rate limiter controla a concorrência real);
+            # a primeira onda com página incompleta encerra a busca, sem requisições além do fim dos dados
+            pages_per_wave = 5
             failed_pages = []
-            for result in results:
-                if isinstance(result, Exception):
-                    logger.error(f"Exceção: {str(result)}")
-                    continue
+            has_more = True
+            next_page = 2
+            while has_more and next_page <= max_pages:
+                pages_to_fetch = list(range(next_page, min(next_page + pages_per_wave, max_pages + 1)))
+                next_page = pages_to_fetch[-1] + 1
+                logger.info(f"Buscando páginas {pages_to_fetch} em paralelo...")
+
+                results = await asyncio.gather(
+                    *(fetch_page_with_retry(session, page) for page in pages_to_fetch),
+                    return_exceptions=True
+                )
+
+                for page, result in zip(pages_to_fetch, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Página {page}: Exceção {str(result)}")
+                        failed_pages.append(page)
+                        continue
 
-                if not result["success"]:
-                    failed_pages.append(result["page"])
-                    continue
+                    if not result["success"]:
+                        failed_pages.append(page)
+                        continue
 
-                if result.get("empty"):
-                    continue
+                    data = result["data"]
+                    leads = data.get("_embedded", {}).get("leads", []) if data else []
+                    if leads:
+                        all_leads.extend(leads)
+                        logger.info(f"Página {page}: {len(leads)} leads")
+                    if len(leads) < 250:
+                        has_more = False
 
-                data = result["data"]
-                if data and "_embedded" in data and "leads" in data["_embedded"]:
-                    leads = data["_embedded"]["leads"]
-                    all_leads.extend(leads)
-                    logger.info(f"Página {result['page']}: {len(leads)} leads")
+                if failed_pages and raise_on_failure:
+                    raise Exception(f"get_all_leads_async: falha ao buscar as páginas {failed_pages}")
 
             if failed_pages:
                 logger.warning(f"Páginas com falha: {failed_pages}")
+            if has_more:
+                logger.warning(f"get_all_leads_async: ATINGIU LIMITE de {max_pages} páginas!")
 
         elapsed = time.time() - start_time
         logger.info(f"get_all_leads_async: CONCLUÍDO - {len(all_leads)} leads em {elapsed:.2f}s")
 
         return all_leads
 
-    async def get_all_leads_parallel_async(self, params_list: List[Dict], max_pages: int = 15) -> List[List[Dict]]:
+    async def get_all_leads_parallel_async(self, params_list: List[Dict], max_pages: int = 15,
+                                           raise_on_failure: bool = False) -> List[List[Dict]]:
         """
         Busca leads de MÚLTIPLOS pipelines em paralelo usando aiohttp.
 
         Args:
             params_list: Lista de parâmetros, um para cada pipeline
             max_pages: Máximo de páginas por pipeline
+            raise_on_failure: Se True, levanta exceção quando algum pipeline não foi buscado por completo
+                (em vez de devolver lista vazia/parcial para ele)
 
         Returns:
             Lista de listas, cada uma contendo os leads de um pipeline
@@ -727,7 +840,7 @@ class KommoAPI:
         logger.info(f"get_all_leads_parallel_async: Buscando {len(params_list)} pipelines em paralelo")
 
         # Criar tasks para cada pipeline
-        tasks = [self.get_all_leads_async(params, max_pages) for params in params_list]
+        tasks = [self.get_all_leads_async(params, max_pages, raise_on_failure) for params in params_list]
 
         # Executar todos em paralelo
         results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -737,6 +850,8 @@ class KommoAPI:
         for i, result in enumerate(results):
             if isinstance(result, Exception):
                 logger.error(f"Pipeline {i}: Exceção {str(result)}")
+                if raise_on_failure:
+                    raise result
                 final_results.append([])
             else:
                 final_results.append(result)
@@ -776,7 +891,7 @@ class KommoAPI:
 
             await rate_limiter.wait()
             try:
-                async with session.get(base_url, params=page_params) as response:
+                async with session.get(base_url, params=page_params, headers=self.headers) as response:
                     if response.status == 200:
                         data = await response.json()
                         return {"page": page, "data": data, "success": True}
@@ -787,14 +902,7 @@ class KommoAPI:
                 logger.error(f"Tasks página {page}: Erro {str(e)}")
                 return {"page": page, "data": None, "success": False}
 
-        connector = aiohttp.TCPConnector(limit=15, limit_per_host=10)
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-
-        async with aiohttp.ClientSession(
-            headers=self.headers,
-            connector=connector,
-            timeout=timeout
-        ) as session:
+        async with self._async_session() as session:
             # Primeira página
             first_result = await fetch_page(session, 1)
 
@@ -859,7 +967,7 @@ class KommoAPI:
             await rate_limiter.wait()
             url = f"{self.base_url}/leads/{lead_id}"
             try:
-                async with session.get(url) as response:
+                async with session.get(url, headers=self.headers) as response:
                     if response.status == 200:
                         return await response.json()
                     return None
@@ -867,14 +975,7 @@ class KommoAPI:
                 logger.warning(f"Lead {lead_id}: Erro {str(e)}")
                 return None
 
-        connector = aiohttp.TCPConnector(limit=15, limit_per_host=10)
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-
-        async with aiohttp.ClientSession(
-            headers=self.headers,
-            connector=connector,
-            timeout=timeout
-        ) as session:
+        async with self._async_session() as session:
             tasks = [fetch_lead(session, lid) for lid in lead_ids]
             results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -888,6 +989,54 @@ class KommoAPI:
         logger.info(f"get_leads_batch_async: CONCLUÍDO - {len(leads)} leads em {elapsed:.2f}s")
         return leads
 
+    async def get_leads_by_ids_async(self, lead_ids: List[int], chunk_size: int = 50) -> List[Dict]:
+        """
+        Busca múltiplos leads por ID usando filter[id][] na listagem de leads,
+        com até chunk_size IDs por requisição (lotes em paralelo).
+
+        Args:
+            lead_ids: Lista de IDs de leads a buscar
+            chunk_size: Quantidade de IDs por requisição
+
+        Returns:
+            Lista com os leads encontrados (IDs inexistentes ou de lotes que falharam
+            após os retries ficam de fora)
+        """
+        lead_ids = list(lead_ids)
+        if not lead_ids:
+            return []
+
+        start_time = time.time()
+        logger.info(f"get_leads_by_ids_async: Buscando {len(lead_ids)} leads em lotes de {chunk_size}")
+
+        base_url = f"{self.base_url}/leads"
+        rate_limiter = get_async_rate_limiter()
+        leads = []
+
+        async def fetch_chunk(session: aiohttp.ClientSession, chunk: List[int]) -> List[Dict]:
+            """Busca um lote de leads pelos IDs (lote que falhar fica de fora; o chamador busca os faltantes)"""
+            chunk_params = [("filter[id][]", lead_id) for lead_id in chunk]
+            chunk_params.append(("limit", 250))
+            chunk_params.append(("with", "contacts,custom_fields_values"))
+
+            result = await self._get_json_with_retry(session, base_url, chunk_params, f"Lote de {len(chunk)} leads", rate_limiter)
+            if not result["success"] or not result["data"]:
+                return []
+            return result["data"].get("_embedded", {}).get("leads", [])
+
+        async with self._async_session() as session:
+            chunks = [lead_ids[i:i + chunk_size] for i in range(0, len(lead_ids), chunk_size)]
+            results = await asyncio.gather(*(fetch_chunk(session, chunk) for chunk in chunks), return_exceptions=True)
+
+            for result in results:
+                if isinstance(result, Exception):
+                    continue
+                leads.extend(result)
+
+        elapsed = time.time() - start_time
+        logger.info(f"get_leads_by_ids_async: CONCLUÍDO - {len(leads)} leads em {elapsed:.2f}s")
+        return leads
+
     # Métodos de Utilidade
     def unix_to_datetime(self, timestamp: int) -> datetime:
         """Converte Unix timestamp para objeto datetime"""
@@ -0,0 +1,23 @@
+"""
+Caches em processo do dashboard, compartilhados entre os routers
+(dashboard.py preenche; cache_admin.py limpa)
+"""
+
+# Dados de referência do Kommo (sources, tags, users, pipelines) que mudam raramente
+REFERENCE_CACHE = {}  # key -> (expira_em, valor)
+REFERENCE_LOCKS = {}  # key -> asyncio.Lock (evita buscas simultâneas da mesma chave)
+
+# Leads por pipeline/período (janela de criação), separados dos dados de referência
+LEADS_WINDOW_CACHE = {}  # (max_pages, params por pipeline) -> (expira_em, listas de leads)
+LEADS_WINDOW_LOCKS = {}  # mesma chave -> asyncio.Lock
+
+# Caches de respostas completas dos endpoints (um OrderedDict por endpoint decorado)
+RESPONSE_CACHES = []
+
+
+def clear_dashboard_cache():
+    """Limpa os caches em processo do dashboard (dados de referência, leads e respostas)"""
+    REFERENCE_CACHE.clear()
+    LEADS_WINDOW_CACHE.clear()
+    for cache in RESPONSE_CACHES:
+        cache.clear()
@@ -2,13 +2,18 @@
 Funções auxiliares para processamento de datas no sistema
 """
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Union, Dict, Any
+from functools import lru_cache
+from typing import Optional, Union, Dict, Any, Tuple
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 # Timezone do Brasil (UTC-3)
 BRAZIL_TIMEZONE = timezone(timedelta(hours=-3))
+_BRAZIL_UTC_OFFSET = int(BRAZIL_TIMEZONE.utcoffset(None).total_seconds())
+
+SECONDS_PER_DAY = 24 * 60 * 60
 
 
 def extract_custom_field_value(lead: Dict[str, Any], field_id: int) -> Optional[Any]:
@@ -44,6 +49,51 @@ def extract_custom_field_value(lead: Dict[str, Any], field_id: int) -> Optional[
         return None
 
 
+def extract_custom_fields(lead: Dict[str, Any], field_ids) -> Dict[int, Any]:
+    """
+    Extrai valores de vários campos customizados em uma única passada
+
+    Args:
+        lead: Dicionário do lead
+        field_ids: Conjunto (set/frozenset) com os IDs dos campos desejados
+
+    Returns:
+        Dicionário {field_id: valor} apenas com os campos encontrados
+    """
+    result = {}
+    try:
+        custom_fields = lead.get("custom_fields_values")
+        if not custom_fields:
+            return result
+
+        remaining = len(field_ids)
+        for field in custom_fields:
+            # EAFP: payloads da Kommo são bem formados; campos inválidos caem no except
+            try:
+                field_id = field.get("field_id")
+                if field_id not in field_ids or field_id in result:
+                    continue
+                values = field.get("values")
+                if not values:
+                    continue
+                first_value = values[0]
+            except (AttributeError, TypeError, KeyError, IndexError):
+                continue
+
+            if isinstance(first_value, dict):
+                result[field_id] = first_value.get("value")
+            else:
+                result[field_id] = first_value
+            remaining -= 1
+            if not remaining:
+                # Todos os campos pedidos encontrados; não varrer o restante
+                break
+        return result
+    except Exception as e:
+        logger.error(f"Erro ao extrair campos customizados {field_ids}: {e}")
+        return result
+
+
 def parse_closure_date(date_value: Any) -> Optional[int]:
     """
     Converte valor de data de fechamento para timestamp Unix
@@ -158,10 +208,7 @@ def format_proposal_date(lead: Dict[str, Any], field_id: int = 882618) -> str:
     Returns:
         Data formatada (DD/MM/YYYY HH:MM) ou "N/A" se não encontrada
     """
-    timestamp = get_lead_proposal_date(lead, field_id)
-    if timestamp:
-        return datetime.fromtimestamp(timestamp, tz=BRAZIL_TIMEZONE).strftime("%d/%m/%Y %H:%M")
-    return "N/A"
+    return format_timestamp_brazil(get_lead_proposal_date(lead, field_id))
 
 
 def validate_sale_in_period(
@@ -214,6 +261,10 @@ def format_timestamp_brazil(timestamp: int, format_str: str = "%d/%m/%Y %H:%M")
     """
     if not timestamp:
         return "N/A"
+    if format_str == "%d/%m/%Y %H:%M":
+        # Formato padrão montado direto de time.gmtime (offset fixo), sem datetime + strftime
+        t = time.gmtime(timestamp + _BRAZIL_UTC_OFFSET)
+        return f"{t.tm_mday:02d}/{t.tm_mon:02d}/{t.tm_year:04d} {t.tm_hour:02d}:{t.tm_min:02d}"
     return datetime.fromtimestamp(timestamp, tz=BRAZIL_TIMEZONE).strftime(format_str)
 
 
@@ -224,4 +275,45 @@ def now_brazil_timestamp() -> int:
     Returns:
         Timestamp Unix atual
     """
-    return int(datetime.now(tz=BRAZIL_TIMEZONE).timestamp())
\ No newline at end of file
+    return int(datetime.now(tz=BRAZIL_TIMEZONE).timestamp())
+
+
+# Conversão das datas da query (YYYY-MM-DD) em timestamps, memoizada entre requisições.
+# strptime com formato fixo valida a entrada de forma estrita (fromisoformat no Python 3.11 aceita
+# também 20250101, horários e fusos, que devem continuar sendo rejeitados com 400)
+@lru_cache(maxsize=256)
+def date_start_timestamp(value: str) -> int:
+    """Timestamp do início do dia (00:00:00) da data informada; ValueError se não for YYYY-MM-DD"""
+    return int(datetime.strptime(value, '%Y-%m-%d').timestamp())
+
+
+@lru_cache(maxsize=256)
+def date_end_timestamp(value: str) -> int:
+    """Timestamp do fim do dia (23:59:59) da data informada; ValueError se não for YYYY-MM-DD"""
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(hour=23, minute=59, second=59).timestamp())
+
+
+def resolve_time_window(days: int, start_date: Optional[str], end_date: Optional[str], bucket: int = 0) -> Tuple[int, int]:
+    """
+    Resolve o período de análise em timestamps Unix
+    
+    Args:
+        days: Quantidade de dias do período relativo (usado sem datas específicas)
+        start_date: Data de início (YYYY-MM-DD) ou None
+        end_date: Data de fim (YYYY-MM-DD) ou None
+        bucket: Se > 0, arredonda para baixo o fim do período relativo a múltiplos de bucket segundos
+                (o período nunca termina depois de agora; os leads dos últimos < bucket segundos ficam de fora)
+        
+    Returns:
+        (start_timestamp, end_timestamp); datas específicas vão de 00:00:00 a 23:59:59
+        
+    Raises:
+        ValueError: Se as datas não estiverem no formato YYYY-MM-DD
+    """
+    if start_date and end_date:
+        return date_start_timestamp(start_date), date_end_timestamp(end_date)
+
+    end_timestamp = int(time.time())
+    if bucket > 0:
+        end_timestamp -= end_timestamp % bucket
+    return end_timestamp - days * SECONDS_PER_DAY, end_timestamp
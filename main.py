@@ -38,6 +38,10 @@ app.include_router(auth.router, prefix="/auth", tags=["Auth (mock)"])
 async def startup_event():
     import asyncio
 
+    # Sessão aiohttp compartilhada do cliente Kommo, ligada ao loop da aplicação
+    from app.services.kommo_api import get_kommo_api
+    await get_kommo_api().aopen()
+
     # Scheduler Facebook
     from app.services.scheduler import facebook_scheduler
     facebook_scheduler.start_scheduler()
@@ -60,6 +64,14 @@ async def startup_event():
     except Exception as e:
         print(f"Aviso: Erro ao inicializar MongoDB Kommo: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Fechar pool de conexões HTTP do cliente Kommo
+    from app.services.kommo_api import get_kommo_api
+    kommo_api = get_kommo_api()
+    kommo_api.close()
+    await kommo_api.aclose()
+
 @app.get("/", tags=["Root"])
 async def root():
     return {"message": "Bem-vindo à API do Dashboard Kommo"}